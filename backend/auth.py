@@ -1,17 +1,20 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from database import AsyncSessionLocal, get_async_db
+from cache import TTLCache
+import hashing
 import models
 import schemas
+import hashlib
 import os
+import time
 
-# 密码上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2密码认证流
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
@@ -20,23 +23,39 @@ SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
+# 用户身份缓存配置（按令牌subject即用户名缓存，避免每个请求都查询users表）
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 60))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", 10000))
+user_cache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL)
 
-def verify_password(plain_password, hashed_password):
-    """验证密码"""
-    return pwd_context.verify(plain_password, hashed_password)
+# 已验证令牌缓存：按令牌摘要缓存解码后的声明，有效期至令牌过期
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", 10000))
+token_cache = TTLCache(maxsize=TOKEN_CACHE_MAX_SIZE)
 
+# 缓存的用户字段，不缓存密码哈希
+_CACHED_USER_COLUMNS = [
+    column.key for column in models.User.__table__.columns
+    if column.key != "hashed_password"
+]
 
-def get_password_hash(password):
-    """获取密码哈希"""
-    return pwd_context.hash(password)
 
+async def verify_password(plain_password, hashed_password):
+    """验证密码（在哈希进程池中执行）"""
+    return await hashing.verify_password(plain_password, hashed_password)
 
-def authenticate_user(db: Session, username: str, password: str):
+
+async def get_password_hash(password):
+    """获取密码哈希（在哈希进程池中执行）"""
+    return await hashing.hash_password(password)
+
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
     """验证用户"""
-    user = db.query(models.User).filter(models.User.username == username).first()
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    user = result.scalars().first()
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return False
     return user
 
@@ -53,7 +72,19 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def decode_access_token(token: str) -> dict:
+    """解码并验证访问令牌，命中缓存时跳过签名校验"""
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    payload = token_cache.get(digest)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        ttl = payload.get("exp", 0) - time.time()
+        if ttl > 0:
+            token_cache.set(digest, payload, ttl=ttl)
+    return payload
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     """获取当前用户"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -61,14 +92,44 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
         token_data = schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
-    if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+    cached = user_cache.get(token_data.username)
+    if cached is None:
+        cached = await _load_user(token_data.username)
+        if cached is None:
+            raise credentials_exception
+        user_cache.set(token_data.username, cached)
+    return _attach_cached_user(db, cached)
+
+
+async def _load_user(username: str) -> Optional[dict]:
+    """用独立的短会话查询用户，查询完立即归还连接
+
+    多数路由使用同步会话，认证不在请求会话上开启事务，避免一个请求同时占用两个连接池的连接。
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(*[getattr(models.User, key) for key in _CACHED_USER_COLUMNS])
+            .where(models.User.username == username)
+        )
+        row = result.first()
+    return dict(row._mapping) if row is not None else None
+
+
+def _attach_cached_user(db: AsyncSession, cached: dict):
+    """根据缓存的字段重建用户对象并关联到当前会话，后续修改仍可正常提交"""
+    user = models.User(**cached)
+    make_transient_to_detached(user)
+    db.add(user)
+    return user
+
+
+def invalidate_user_cache(username: str):
+    """用户数据被修改后清除其缓存"""
+    user_cache.pop(username)
\ No newline at end of file
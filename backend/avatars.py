@@ -0,0 +1,68 @@
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from PIL import Image, ImageOps
+import storage
+
+logger = logging.getLogger(__name__)
+
+# 头像衍生图尺寸（像素），统一转码为WebP
+AVATAR_SIZES = [int(size) for size in os.getenv("AVATAR_SIZES", "64,128,256").split(",")]
+AVATAR_WEBP_QUALITY = int(os.getenv("AVATAR_WEBP_QUALITY", 80))
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(fileobj) -> str:
+    """分块计算文件内容的SHA-256，计算后将文件指针复位"""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(_HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def original_key(avatar_hash: str) -> str:
+    """原图按内容哈希存储，相同内容只保存一份"""
+    return f"{avatar_hash}/original"
+
+
+def variant_key(avatar_hash: str, size: int) -> str:
+    return f"{avatar_hash}/{size}.webp"
+
+
+def variant_urls(avatar_hash: str) -> dict:
+    """各尺寸衍生图的公开URL"""
+    return {str(size): storage.public_url(variant_key(avatar_hash, size)) for size in AVATAR_SIZES}
+
+
+def missing_variants(avatar_hash: str) -> list:
+    """尚未生成的衍生图尺寸"""
+    return [size for size in AVATAR_SIZES if not storage.object_exists(variant_key(avatar_hash, size))]
+
+
+def generate_variants(avatar_hash: str) -> bool:
+    """从原图生成各尺寸的WebP衍生图并上传，已存在的尺寸跳过（在后台任务中执行），全部尺寸都已存在时返回True"""
+    missing = missing_variants(avatar_hash)
+    if not missing:
+        return True
+    try:
+        with tempfile.TemporaryFile() as original:
+            storage.download_fileobj(original_key(avatar_hash), original)
+            original.seek(0)
+            with Image.open(original) as image:
+                image = ImageOps.exif_transpose(image).convert("RGBA")
+                for size in missing:
+                    variant = ImageOps.fit(image, (size, size), Image.LANCZOS)
+                    buffer = io.BytesIO()
+                    variant.save(buffer, format="WEBP", quality=AVATAR_WEBP_QUALITY)
+                    buffer.seek(0)
+                    storage.upload_fileobj(buffer, variant_key(avatar_hash, size), "image/webp")
+        logger.info(f"头像衍生图生成完成: {avatar_hash} {missing}")
+        return True
+    except Exception as e:
+        logger.error(f"生成头像衍生图失败: {avatar_hash}: {e}")
+        return False
@@ -0,0 +1,848 @@
+"""端到端基准测试
+
+在进程内通过ASGI直接调用应用（不经过网络和uvicorn），逐个场景测量延迟分位数、吞吐量和每个请求执行的SQL语句数，
+结果写入JSON文件，可以作为基线与之后的结果对比。数据库由DATABASE_URL指定（SQLite或本地MySQL），
+可先用seed.py生成数据。
+
+用法:
+    DATABASE_URL=sqlite:///./bench.db python seed.py --users 1000 --articles 20000 --contacts 50000
+    DATABASE_URL=sqlite:///./bench.db python bench.py --output baseline.json
+    DATABASE_URL=sqlite:///./bench.db python bench.py --baseline baseline.json --fail-on-regression
+    python bench.py --list                                   列出所有场景
+    python bench.py --only 'articles.*' --requests 500 --concurrency 16
+    python bench.py --only 'articles.list_*_deep'             第1000页：OFFSET分页与游标分页对比
+    python bench.py --only 'articles.search*'                 FULLTEXT（MySQL）与LIKE搜索对比
+    python bench.py --explain                                同时检查各场景的查询是否全表扫描
+    python bench.py --pool-sizes 5,10,20 --only 'articles.list*'   不同连接池大小下的吞吐量
+    python bench.py --serialization                          列表响应序列化的微基准（不访问数据库）
+
+每次运行会注册一个新的测试用户并创建少量文章和联系人作为固定数据，写入类场景会修改数据库中的数据。
+"""
+import argparse
+import asyncio
+import contextlib
+import fnmatch
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from collections import Counter
+from datetime import datetime
+
+API_V1_PREFIX = "/api/v1"
+BENCH_PASSWORD = "bench-password"
+BENCH_BIRTHDAY = "1990-01-01"
+# 需要计算bcrypt的场景请求数上限，避免单个场景耗时过长
+HASHING_MAX_REQUESTS = 50
+PROVISION_BATCH_SIZE = 10
+BULK_BATCH_SIZE = 100
+# 准备数据时每次批量创建的联系人数（不超过CONTACTS_BULK_MAX）
+PREPARE_BATCH_SIZE = 1000
+# 批量查询用户等场景使用的已有用户ID数量
+USER_SAMPLE_SIZE = 100
+# 深分页场景的页码和每页条数（需要先用seed.py生成足够的文章）
+DEEP_PAGE = 1000
+DEEP_PAGE_SIZE = 20
+# 搜索未命中场景使用的词（不在seed.py的词表中，LIKE需要扫描全表）
+SEARCH_MISS_TERM = "不存在的词"
+
+
+class Scenario:
+    """一个基准场景：build(ctx, i)返回第i个请求的(method, 路径, 请求参数)，api为True时路径相对于/api/v1
+
+    patch返回一个上下文管理器，在整个场景（准备、预热和测量）期间生效，用于切换应用中的实现做对比
+    """
+
+    def __init__(self, name, build, prepare=None, expect=200, storage=False, max_requests=None, api=True, patch=None):
+        self.name = name
+        self.api = api
+        self.build = build
+        self.prepare = prepare
+        self.expect = expect
+        self.storage = storage
+        self.max_requests = max_requests
+        self.patch = patch or contextlib.nullcontext
+
+
+SCENARIOS = []
+
+
+def scenario(name, prepare=None, expect=200, storage=False, max_requests=None, api=True, patch=None):
+    def decorator(build):
+        SCENARIOS.append(Scenario(name, build, prepare, expect, storage, max_requests, api, patch))
+        return build
+    return decorator
+
+
+class BenchContext:
+    """场景共享的状态：测试用户、令牌和预先创建的数据"""
+
+    def __init__(self, client, prefix: str):
+        self.client = client
+        self.prefix = prefix
+        self.username = f"{prefix}user"
+        self.headers = {}
+        self.user_id = None
+        self.user_ids = []
+        self.article_ids = []
+        self.contact_ids = []
+        self.article_cursor = None
+        self.deep_skip = DEEP_PAGE * DEEP_PAGE_SIZE
+        self.deep_cursor = None
+        self.article_etag = None
+        self.avatar = None
+        self.provisioning_token = None
+        # 删除类场景预先创建的待删除ID
+        self.disposable = {}
+        self._counter = itertools.count()
+
+    def unique(self) -> int:
+        return next(self._counter)
+
+    async def post(self, path: str, **kwargs):
+        response = await self.client.post(API_V1_PREFIX + path, headers=self.headers, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f"准备数据失败: POST {path} {response.status_code} {response.text[:200]}")
+        return response
+
+
+def _pick(items, i):
+    return items[i % len(items)]
+
+
+def _article_payload(i: int) -> dict:
+    from seed import WORDS
+    return {"title": f"基准测试文章 {i}", "content": " ".join(WORDS) * 5}
+
+
+def _contact_payload(i: int) -> dict:
+    return {"name": f"联系人{i}", "province": "广东省", "city": "深圳市", "address": f"科技路{i}号", "postal_code": "518000"}
+
+
+# ---- 系统 ----
+
+@scenario("system.health", api=False)
+def _health(ctx, i):
+    return "GET", "/health", {}
+
+
+@scenario("system.ready", api=False)
+def _ready(ctx, i):
+    return "GET", "/ready", {}
+
+
+@scenario("system.metrics", api=False)
+def _metrics(ctx, i):
+    return "GET", "/metrics", {}
+
+
+# ---- 认证 ----
+
+@scenario("auth.register", max_requests=HASHING_MAX_REQUESTS)
+def _register(ctx, i):
+    n = ctx.unique()
+    return "POST", "/auth/register", {"json": {
+        "username": f"{ctx.prefix}r{n}", "email": f"{ctx.prefix}r{n}@example.com", "password": BENCH_PASSWORD,
+    }}
+
+
+@scenario("auth.login", max_requests=HASHING_MAX_REQUESTS)
+def _login(ctx, i):
+    return "POST", "/auth/login", {"data": {"username": ctx.username, "password": BENCH_PASSWORD}}
+
+
+async def _prepare_password_users(ctx, count):
+    """每个请求使用各自的用户，避免并发修改同一用户的密码互相冲突（直接写库，所有用户共用一个哈希）"""
+    from sqlalchemy import insert
+    import database
+    import models
+    from hashing import pwd_context
+    hashed_password = pwd_context.hash(BENCH_PASSWORD)
+    usernames = [f"{ctx.prefix}cp{ctx.unique()}" for _ in range(count)]
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"username": name, "email": f"{name}@example.com", "hashed_password": hashed_password, "balance": 0.0}
+            for name in usernames
+        ])
+    ctx.disposable["password_users"] = usernames
+
+
+@scenario("auth.change_password", prepare=_prepare_password_users, max_requests=HASHING_MAX_REQUESTS)
+def _change_password(ctx, i):
+    return "POST", "/auth/change-password", {"json": {
+        "username": ctx.disposable["password_users"][i], "old_password": BENCH_PASSWORD,
+        "new_password": BENCH_PASSWORD + "-new",
+    }}
+
+
+@scenario("auth.verify_birthday")
+def _verify_birthday(ctx, i):
+    return "POST", "/auth/verify-birthday", {"json": {"username": ctx.username, "birthday": BENCH_BIRTHDAY}}
+
+
+@scenario("auth.reset_password", max_requests=HASHING_MAX_REQUESTS)
+def _reset_password(ctx, i):
+    return "POST", "/auth/reset-password", {"json": {"username": ctx.username, "new_password": BENCH_PASSWORD}}
+
+
+@scenario("auth.provision", max_requests=HASHING_MAX_REQUESTS // PROVISION_BATCH_SIZE)
+def _provision(ctx, i):
+    items = []
+    for _ in range(PROVISION_BATCH_SIZE):
+        n = ctx.unique()
+        items.append({"username": f"{ctx.prefix}p{n}", "email": f"{ctx.prefix}p{n}@example.com", "password": BENCH_PASSWORD})
+    return "POST", "/auth/provision", {"json": items, "headers": {"X-Provisioning-Token": ctx.provisioning_token}}
+
+
+# ---- 用户 ----
+
+@scenario("users.me")
+def _users_me(ctx, i):
+    return "GET", "/users/me", {}
+
+
+@scenario("users.update_me")
+def _users_update_me(ctx, i):
+    return "PUT", "/users/me", {"json": {"balance": float(i)}}
+
+
+@scenario("users.get")
+def _users_get(ctx, i):
+    return "GET", f"/users/{_pick(ctx.user_ids, i)}", {}
+
+
+@scenario("users.list_by_ids")
+def _users_list_by_ids(ctx, i):
+    return "GET", "/users/", {"params": {"ids": ",".join(str(user_id) for user_id in ctx.user_ids[:50])}}
+
+
+@scenario("users.batch")
+def _users_batch(ctx, i):
+    return "POST", "/users/batch", {"json": {"ids": ctx.user_ids}}
+
+
+@scenario("users.avatar", storage=True)
+def _users_avatar(ctx, i):
+    return "POST", "/users/avatar", {"files": {"file": ("avatar.png", ctx.avatar, "image/png")}}
+
+
+# ---- 文章 ----
+
+async def _prepare_article_cursor(ctx, count):
+    response = await ctx.client.get(f"{API_V1_PREFIX}/articles/", headers=ctx.headers, params={"limit": 20})
+    ctx.article_cursor = response.headers.get("x-next-cursor")
+
+
+async def _prepare_deep_page(ctx, count):
+    """计算第DEEP_PAGE页的OFFSET和对应的游标（上一页最后一篇文章的ID），文章不足时取最后一页"""
+    from sqlalchemy import func, select
+    import database
+    import models
+    from pagination import encode_cursor
+    with database.engine.connect() as conn:
+        total = conn.execute(select(func.count()).select_from(models.Article)).scalar()
+        page = min(DEEP_PAGE, max(total - 1, 0) // DEEP_PAGE_SIZE)
+        if page < DEEP_PAGE:
+            print(f"    文章只有{total}篇，深分页场景改用第{page + 1}页（用seed.py生成更多数据）")
+        ctx.deep_skip = page * DEEP_PAGE_SIZE
+        last_id = conn.execute(
+            select(models.Article.id).order_by(models.Article.id).offset(ctx.deep_skip - 1).limit(1)
+        ).scalar() if ctx.deep_skip else None
+    ctx.deep_cursor = encode_cursor({"id": last_id}) if last_id is not None else None
+
+
+@contextlib.contextmanager
+def _like_search():
+    """让文章搜索走LIKE回退路径（与MySQL上的FULLTEXT搜索对比）"""
+    from routers import articles
+    original = articles._search_relevance
+    articles._search_relevance = lambda db, search: None
+    try:
+        yield
+    finally:
+        articles._search_relevance = original
+
+
+async def _prepare_article_etag(ctx, count):
+    response = await ctx.client.get(f"{API_V1_PREFIX}/articles/{ctx.article_ids[0]}", headers=ctx.headers)
+    ctx.article_etag = response.headers.get("etag")
+
+
+async def _prepare_disposable_articles(ctx, count):
+    ids = []
+    for n in range(count):
+        ids.append((await ctx.post("/articles/", json=_article_payload(n))).json()["id"])
+    ctx.disposable["articles"] = ids
+
+
+@scenario("articles.list")
+def _articles_list(ctx, i):
+    return "GET", "/articles/", {"params": {"limit": 20}}
+
+
+@scenario("articles.list_cursor", prepare=_prepare_article_cursor)
+def _articles_list_cursor(ctx, i):
+    params = {"limit": 20}
+    if ctx.article_cursor:
+        params["cursor"] = ctx.article_cursor
+    return "GET", "/articles/", {"params": params}
+
+
+@scenario("articles.list_offset_deep", prepare=_prepare_deep_page)
+def _articles_list_offset_deep(ctx, i):
+    return "GET", "/articles/", {"params": {"limit": DEEP_PAGE_SIZE, "skip": ctx.deep_skip}}
+
+
+@scenario("articles.list_cursor_deep", prepare=_prepare_deep_page)
+def _articles_list_cursor_deep(ctx, i):
+    params = {"limit": DEEP_PAGE_SIZE}
+    if ctx.deep_cursor:
+        params["cursor"] = ctx.deep_cursor
+    return "GET", "/articles/", {"params": params}
+
+
+@scenario("articles.list_excerpt")
+def _articles_list_excerpt(ctx, i):
+    return "GET", "/articles/", {"params": {"limit": 20, "fields": "id,title,content,author_id", "excerpt": 100}}
+
+
+@scenario("articles.list_with_authors")
+def _articles_list_with_authors(ctx, i):
+    return "GET", "/articles/", {"params": {"limit": 20, "include_author": "true"}}
+
+
+@scenario("articles.list_by_author")
+def _articles_list_by_author(ctx, i):
+    return "GET", "/articles/", {"params": {"limit": 20, "author_id": ctx.user_id}}
+
+
+def _search_params(i):
+    from seed import WORDS
+    return {"params": {"limit": 20, "search": _pick(WORDS, i)}}
+
+
+# 非MySQL数据库没有FULLTEXT索引，search与search_like都走LIKE
+@scenario("articles.search")
+def _articles_search(ctx, i):
+    return "GET", "/articles/", _search_params(i)
+
+
+@scenario("articles.search_like", patch=_like_search)
+def _articles_search_like(ctx, i):
+    return "GET", "/articles/", _search_params(i)
+
+
+@scenario("articles.search_miss")
+def _articles_search_miss(ctx, i):
+    return "GET", "/articles/", {"params": {"limit": 20, "search": SEARCH_MISS_TERM}}
+
+
+@scenario("articles.search_miss_like", patch=_like_search)
+def _articles_search_miss_like(ctx, i):
+    return "GET", "/articles/", {"params": {"limit": 20, "search": SEARCH_MISS_TERM}}
+
+
+@scenario("articles.create", expect=201)
+def _articles_create(ctx, i):
+    return "POST", "/articles/", {"json": _article_payload(i)}
+
+
+@scenario("articles.get")
+def _articles_get(ctx, i):
+    return "GET", f"/articles/{_pick(ctx.article_ids, i)}", {}
+
+
+@scenario("articles.get_not_modified", prepare=_prepare_article_etag, expect=304)
+def _articles_get_not_modified(ctx, i):
+    return "GET", f"/articles/{ctx.article_ids[0]}", {"headers": {"If-None-Match": ctx.article_etag}}
+
+
+@scenario("articles.update")
+def _articles_update(ctx, i):
+    return "PUT", f"/articles/{ctx.article_ids[-1]}", {"json": _article_payload(i)}
+
+
+@scenario("articles.delete", prepare=_prepare_disposable_articles, expect=204)
+def _articles_delete(ctx, i):
+    return "DELETE", f"/articles/{ctx.disposable['articles'][i]}", {}
+
+
+@scenario("articles.export_ndjson")
+def _articles_export_ndjson(ctx, i):
+    return "GET", "/articles/export", {"params": {"author_id": ctx.user_id}}
+
+
+@scenario("articles.export_csv")
+def _articles_export_csv(ctx, i):
+    return "GET", "/articles/export", {"params": {"author_id": ctx.user_id, "format": "csv"}}
+
+
+@scenario("articles.author_stats")
+def _articles_author_stats(ctx, i):
+    return "GET", "/articles/author/stats", {"params": {"limit": 20}}
+
+
+# ---- 联系人 ----
+
+async def _prepare_disposable_contacts(ctx, count):
+    for start in range(0, count, PREPARE_BATCH_SIZE):
+        await ctx.post("/contacts/bulk", json=[_contact_payload(n) for n in range(start, min(start + PREPARE_BATCH_SIZE, count))])
+    ctx.disposable["contacts"] = await _contact_ids(ctx, count)
+
+
+async def _prepare_bulk_delete_contacts(ctx, count):
+    await _prepare_disposable_contacts(ctx, count * BULK_BATCH_SIZE)
+    ctx.disposable["contacts_bulk"] = ctx.disposable.pop("contacts")
+
+
+async def _contact_ids(ctx, count):
+    """取当前用户最新创建的count个联系人ID（批量创建接口不返回ID）"""
+    from sqlalchemy import select
+    import database
+    import models
+    with database.engine.connect() as conn:
+        rows = conn.execute(
+            select(models.Contact.id).where(models.Contact.user_id == ctx.user_id)
+            .order_by(models.Contact.id.desc()).limit(count)
+        ).scalars().all()
+    return sorted(rows)
+
+
+@scenario("contacts.list")
+def _contacts_list(ctx, i):
+    return "GET", "/contacts/", {"params": {"limit": 20}}
+
+
+@scenario("contacts.search")
+def _contacts_search(ctx, i):
+    return "GET", "/contacts/", {"params": {"limit": 20, "search": str(i % 10)}}
+
+
+@scenario("contacts.create", expect=201)
+def _contacts_create(ctx, i):
+    return "POST", "/contacts/", {"json": _contact_payload(i)}
+
+
+@scenario("contacts.get")
+def _contacts_get(ctx, i):
+    return "GET", f"/contacts/{_pick(ctx.contact_ids, i)}", {}
+
+
+@scenario("contacts.update")
+def _contacts_update(ctx, i):
+    return "PUT", f"/contacts/{ctx.contact_ids[-1]}", {"json": _contact_payload(i)}
+
+
+@scenario("contacts.delete", prepare=_prepare_disposable_contacts, expect=204)
+def _contacts_delete(ctx, i):
+    return "DELETE", f"/contacts/{ctx.disposable['contacts'][i]}", {}
+
+
+@scenario("contacts.bulk_create")
+def _contacts_bulk_create(ctx, i):
+    return "POST", "/contacts/bulk", {"json": [_contact_payload(n) for n in range(BULK_BATCH_SIZE)]}
+
+
+@scenario("contacts.bulk_update")
+def _contacts_bulk_update(ctx, i):
+    return "PUT", "/contacts/bulk", {"json": [
+        {"id": contact_id, "name": f"联系人{i}"} for contact_id in ctx.contact_ids[:BULK_BATCH_SIZE]
+    ]}
+
+
+@scenario("contacts.bulk_delete", prepare=_prepare_bulk_delete_contacts)
+def _contacts_bulk_delete(ctx, i):
+    ids = ctx.disposable["contacts_bulk"][i * BULK_BATCH_SIZE:(i + 1) * BULK_BATCH_SIZE]
+    return "DELETE", "/contacts/bulk", {"json": {"ids": ids}}
+
+
+@scenario("contacts.export")
+def _contacts_export(ctx, i):
+    return "GET", "/contacts/export", {}
+
+
+# ---- 执行 ----
+
+def _engines():
+    import database
+    import replicas
+    return (database.engine, database.async_engine.sync_engine, *replicas.sync_engines())
+
+
+def _select(args):
+    selected = []
+    for item in SCENARIOS:
+        if args.only and not any(fnmatch.fnmatch(item.name, pattern) for pattern in args.only):
+            continue
+        if any(fnmatch.fnmatch(item.name, pattern) for pattern in args.skip):
+            continue
+        if item.storage and not args.storage:
+            continue
+        selected.append(item)
+    return selected
+
+
+def _percentile(sorted_values, percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+async def _send(client, ctx, item: Scenario, i: int):
+    method, path, kwargs = item.build(ctx, i)
+    headers = dict(ctx.headers, **kwargs.pop("headers", {}))
+    url = API_V1_PREFIX + path if item.api else path
+    return await client.request(method, url, headers=headers, **kwargs)
+
+
+async def _run_scenario(client, ctx, item: Scenario, args) -> dict:
+    with item.patch():
+        return await _measure(client, ctx, item, args)
+
+
+async def _measure(client, ctx, item: Scenario, args) -> dict:
+    from query_counter import QueryCounter, scanned_statements
+    count = min(args.requests, item.max_requests or args.requests)
+    warmup = min(args.warmup, count) if item.max_requests else args.warmup
+    if args.explain:
+        warmup = max(warmup, 1)
+    if item.prepare:
+        await item.prepare(ctx, warmup + count)
+
+    explained = None
+    for i in range(warmup):
+        if i == 0 and args.explain:
+            with QueryCounter(*_engines()) as explained:
+                await _send(client, ctx, item, i)
+        else:
+            await _send(client, ctx, item, i)
+
+    latencies = []
+    statuses = Counter()
+    errors = []
+    indexes = iter(range(warmup, warmup + count))
+
+    async def worker():
+        for i in indexes:
+            started = time.perf_counter()
+            response = await _send(client, ctx, item, i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] += 1
+            if response.status_code != item.expect and not errors:
+                errors.append(f"{response.status_code} {response.text[:200]}")
+
+    with QueryCounter(*_engines()) as counter:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(min(args.concurrency, count))))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        "requests": count,
+        "concurrency": min(args.concurrency, count),
+        "errors": count - statuses[item.expect],
+        "status_codes": {str(code): number for code, number in sorted(statuses.items())},
+        "p50_ms": round(_percentile(latencies, 50), 3),
+        "p90_ms": round(_percentile(latencies, 90), 3),
+        "p99_ms": round(_percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "queries_per_request": round(counter.count / count, 2) if count else 0.0,
+    }
+    if errors:
+        result["first_error"] = errors[0]
+    if explained is not None:
+        result["full_scans"] = [
+            {"tables": tables, "statement": statement}
+            for tables, statement in scanned_statements(explained.executions)
+        ]
+    return result
+
+
+async def _setup(client, args) -> BenchContext:
+    """注册测试用户并创建固定数据"""
+    from sqlalchemy import select
+    import database
+    import models
+    from routers import auth as auth_router
+
+    ctx = BenchContext(client, f"bench{int(time.time())}_")
+    ctx.provisioning_token = auth_router.PROVISIONING_TOKEN
+    response = await client.post(f"{API_V1_PREFIX}/auth/register", json={
+        "username": ctx.username, "email": f"{ctx.username}@example.com",
+        "password": BENCH_PASSWORD, "birthday": BENCH_BIRTHDAY,
+    })
+    if response.status_code != 200:
+        raise RuntimeError(f"注册测试用户失败: {response.status_code} {response.text[:200]}")
+    ctx.user_id = response.json()["id"]
+    response = await client.post(f"{API_V1_PREFIX}/auth/login", data={"username": ctx.username, "password": BENCH_PASSWORD})
+    ctx.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    for n in range(args.fixture_articles):
+        ctx.article_ids.append((await ctx.post("/articles/", json=_article_payload(n))).json()["id"])
+    await ctx.post("/contacts/bulk", json=[_contact_payload(n) for n in range(args.fixture_contacts)])
+    ctx.contact_ids = await _contact_ids(ctx, args.fixture_contacts)
+
+    with database.engine.connect() as conn:
+        ctx.user_ids = conn.execute(
+            select(models.User.id).order_by(models.User.id).limit(USER_SAMPLE_SIZE)
+        ).scalars().all()
+
+    if args.storage:
+        import io
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.effect_noise((512, 512), 64).convert("RGB").save(buffer, format="PNG")
+        ctx.avatar = buffer.getvalue()
+    return ctx
+
+
+def _dataset_meta() -> dict:
+    from sqlalchemy import func, select
+    from sqlalchemy.engine import make_url
+    import database
+    import models
+    with database.engine.connect() as conn:
+        rows = {
+            model.__tablename__: conn.execute(select(func.count()).select_from(model)).scalar()
+            for model in (models.User, models.Article, models.Contact)
+        }
+    return {
+        "database": make_url(database.SQLALCHEMY_DATABASE_URL).render_as_string(hide_password=True),
+        "dialect": database.engine.dialect.name,
+        "pool_size": database.DB_POOL_SIZE,
+        "max_overflow": database.DB_MAX_OVERFLOW,
+        "rows": rows,
+    }
+
+
+def _meta(args) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "warmup": args.warmup,
+    }
+
+
+def _import_app(args):
+    """在设置好环境变量后再导入应用（数据库等配置在导入时读取）"""
+    # 只在基准进程内启用批量开通接口
+    os.environ.setdefault("PROVISIONING_TOKEN", "bench-provisioning-token")
+    import migrate
+    import main
+    migrate.migrate()
+    if not args.verbose:
+        # 每个请求都会输出SQL统计日志，基准测试时只保留警告以上的日志
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger("main").setLevel(logging.WARNING)
+        logging.getLogger("instrumentation").setLevel(logging.ERROR)
+    return main.app
+
+
+def _print_header():
+    # 表头使用ASCII字符，避免中文宽度导致列不对齐
+    print(f"{'scenario':<32}{'requests':>9}{'errors':>7}{'p50(ms)':>10}{'p99(ms)':>10}{'rps':>11}{'sql/req':>9}")
+
+
+def _print_result(name: str, result: dict):
+    print(f"{name:<32}{result['requests']:>9}{result['errors']:>7}{result['p50_ms']:>10.2f}"
+          f"{result['p99_ms']:>10.2f}{result['throughput_rps']:>11.1f}{result['queries_per_request']:>9.2f}")
+    if result.get("first_error"):
+        print(f"    首个错误: {result['first_error']}")
+    for scan in result.get("full_scans", []):
+        print(f"    全表扫描 [{', '.join(scan['tables'])}] {scan['statement'][:160]}")
+
+
+async def run_scenarios(args) -> dict:
+    import httpx
+    app = _import_app(args)
+    selected = _select(args)
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            ctx = await _setup(client, args)
+            report = {"meta": dict(_meta(args), **_dataset_meta()), "scenarios": {}}
+            _print_header()
+            for item in selected:
+                result = await _run_scenario(client, ctx, item, args)
+                report["scenarios"][item.name] = result
+                _print_result(item.name, result)
+    finally:
+        await app.router.shutdown()
+    return report
+
+
+def compare(baseline: dict, report: dict, threshold: float) -> list:
+    """与基线对比并输出变化，返回退化的场景说明"""
+    regressions = []
+    print(f"\n与基线对比（{baseline['meta'].get('commit')} @ {baseline['meta'].get('started_at')}）:")
+    print(f"{'scenario':<32}{'p50(ms)':>18}{'p99(ms)':>18}{'rps':>20}{'sql/req':>14}")
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+
+    for name, new in report["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            continue
+        print(f"{name:<32}{new['p50_ms']:>10.2f} {change(old['p50_ms'], new['p50_ms']):>7}"
+              f"{new['p99_ms']:>10.2f} {change(old['p99_ms'], new['p99_ms']):>7}"
+              f"{new['throughput_rps']:>12.1f} {change(old['throughput_rps'], new['throughput_rps']):>7}"
+              f"{old['queries_per_request']:>7.2f}→{new['queries_per_request']:<6.2f}")
+        if old["p99_ms"] and new["p99_ms"] > old["p99_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p99 {old['p99_ms']}ms → {new['p99_ms']}ms")
+        if old["throughput_rps"] and new["throughput_rps"] < old["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{name}: 吞吐量 {old['throughput_rps']} → {new['throughput_rps']} rps")
+        if new["queries_per_request"] > old["queries_per_request"]:
+            regressions.append(f"{name}: SQL语句数 {old['queries_per_request']} → {new['queries_per_request']}")
+    return regressions
+
+
+def run_pool_sweep(args) -> dict:
+    """在子进程中用不同的DB_POOL_SIZE运行所选场景（连接池大小在导入时读取）"""
+    sweep = {}
+    for size in args.pool_sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "result.json")
+            command = [
+                sys.executable, os.path.abspath(__file__),
+                "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                "--warmup", str(args.warmup), "--output", output,
+                "--fixture-articles", str(args.fixture_articles), "--fixture-contacts", str(args.fixture_contacts),
+            ]
+            for pattern in args.only:
+                command += ["--only", pattern]
+            for pattern in args.skip:
+                command += ["--skip", pattern]
+            print(f"\n== DB_POOL_SIZE={size} ==")
+            subprocess.run(command, env=dict(os.environ, DB_POOL_SIZE=str(size)), check=True)
+            with open(output) as f:
+                result = json.load(f)
+        sweep[str(size)] = result
+    if sweep and next(iter(sweep.values()))["meta"]["dialect"] == "sqlite":
+        print("\n注意: SQLite不使用QueuePool，连接池大小不影响结果，请在MySQL上运行")
+
+    names = list(next(iter(sweep.values()))["scenarios"]) if sweep else []
+    print(f"\n{'scenario':<32}" + "".join(f"{'pool=' + size:>22}" for size in sweep))
+    for name in names:
+        cells = []
+        for result in sweep.values():
+            item = result["scenarios"][name]
+            cells.append(f"{item['throughput_rps']:>10.1f}rps {item['p99_ms']:>7.1f}ms")
+        print(f"{name:<32}" + "".join(f"{cell:>22}" for cell in cells))
+    return {
+        "meta": _meta(args),
+        "pool_sweep": {size: result["scenarios"] for size, result in sweep.items()},
+    }
+
+
+def run_serialization(args) -> dict:
+    """对比文章列表两种序列化方式的耗时：逐行构造Pydantic模型后jsonable_encoder+json，与直接投影+orjson"""
+    from types import SimpleNamespace
+    from fastapi.encoders import jsonable_encoder
+    import schemas
+    from serialization import ARTICLE_FIELDS, rows_response
+    from seed import WORDS
+
+    now = datetime.utcnow()
+    results = {}
+    print(f"{'page_size':<14}{'pydantic+json(ms)':>20}{'orjson(ms)':>18}{'speedup':>8}")
+    for page_size in (20, 100, 500):
+        rows = [
+            SimpleNamespace(id=n, title=f"文章{n}", content=" ".join(WORDS) * 5, author_id=n % 50,
+                            version=1, created_at=now, updated_at=now)
+            for n in range(page_size)
+        ]
+
+        def pydantic_path():
+            return json.dumps(jsonable_encoder([schemas.ArticleListItem.from_orm(row) for row in rows]))
+
+        def orjson_path():
+            return rows_response(rows, ARTICLE_FIELDS).body
+
+        timings = {}
+        for label, func in (("pydantic_ms", pydantic_path), ("orjson_ms", orjson_path)):
+            number, _ = timeit.Timer(func).autorange()
+            timings[label] = round(min(timeit.repeat(func, number=number, repeat=5)) / number * 1000, 4)
+        timings["speedup"] = round(timings["pydantic_ms"] / timings["orjson_ms"], 1)
+        results[str(page_size)] = timings
+        print(f"{page_size:<14}{timings['pydantic_ms']:>20.3f}{timings['orjson_ms']:>18.3f}{timings['speedup']:>7.1f}x")
+    return {"meta": _meta(args), "serialization": results}
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="端到端基准测试")
+    parser.add_argument("--requests", type=int, default=200, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=1, help="并发请求数")
+    parser.add_argument("--warmup", type=int, default=5, help="每个场景预热的请求数（不计入结果）")
+    parser.add_argument("--only", action="append", default=[], help="只运行匹配的场景（支持通配符，可重复）")
+    parser.add_argument("--skip", action="append", default=[], help="跳过匹配的场景（支持通配符，可重复）")
+    parser.add_argument("--storage", action="store_true", help="包含需要S3存储的场景（头像上传）")
+    parser.add_argument("--explain", action="store_true", help="用EXPLAIN检查各场景的查询是否全表扫描")
+    parser.add_argument("--fixture-articles", type=int, default=50, help="测试用户的文章数")
+    parser.add_argument("--fixture-contacts", type=int, default=200, help="测试用户的联系人数")
+    parser.add_argument("--output", default="bench-results.json", help="结果JSON文件")
+    parser.add_argument("--baseline", help="作为基线对比的结果JSON文件")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p99或吞吐量变化超过该比例视为退化")
+    parser.add_argument("--fail-on-regression", action="store_true", help="出现退化时以非零状态退出")
+    parser.add_argument("--pool-sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        help="逗号分隔的连接池大小，分别运行所选场景并对比吞吐量")
+    parser.add_argument("--serialization", action="store_true", help="只运行序列化微基准")
+    parser.add_argument("--list", action="store_true", help="列出所有场景")
+    parser.add_argument("--verbose", action="store_true", help="输出应用日志")
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_args()
+    if args.list:
+        for item in SCENARIOS:
+            print(item.name + ("  (需要S3)" if item.storage else ""))
+        return
+
+    if args.serialization:
+        report = run_serialization(args)
+    elif args.pool_sizes:
+        report = run_pool_sweep(args)
+    else:
+        report = asyncio.run(run_scenarios(args))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {args.output}")
+
+    if args.baseline and "scenarios" in report:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print("\n性能退化:")
+            for line in regressions:
+                print(f"  {line}")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
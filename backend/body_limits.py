@@ -0,0 +1,59 @@
+from fastapi import status
+from fastapi.responses import ORJSONResponse
+
+
+class BodySizeLimitMiddleware:
+    """按路径限制请求体大小，在框架读取（暂存）请求体之前拒绝超限的请求
+
+    带Content-Length时直接按请求头返回413；分块传输等没有Content-Length的请求边读边计数，超过上限时中止读取。
+    limits为{路径: 最大字节数}。
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await _reject(scope, receive, send, limit)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            # 超过上限后自行返回413，并让应用看到客户端已断开，停止读取请求体
+            # （不在receive中抛异常：经过中间件时异常可能被包装，被框架当作请求体解析错误返回400）
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    rejected = True
+                    await _reject(scope, receive, send, limit)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            # 已经返回413时丢弃应用随后发送的响应
+            if not rejected:
+                await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+
+async def _reject(scope, receive, send, limit: int):
+    response = ORJSONResponse(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, content={"detail": _detail(limit)})
+    await response(scope, receive, send)
+
+
+def _detail(limit: int) -> str:
+    return f"请求体不能超过{limit // 1024}KB"
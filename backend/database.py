@@ -1,10 +1,15 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 import time
 import logging
+from instrumentation import instrument_engine, register_pool_gauges, timed_pool_class
+import metrics
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
@@ -19,16 +24,126 @@ SQLALCHEMY_DATABASE_URL = os.getenv(
     f"mysql+pymysql://{os.getenv('MYSQL_USER', 'app_user')}:{os.getenv('MYSQL_PASSWORD', 'app_password')}@{os.getenv('MYSQL_HOST', 'mysql')}:{os.getenv('MYSQL_PORT', '3306')}/{os.getenv('MYSQL_DATABASE', 'article_db')}"
 )
 
+# 同步驱动到异步驱动的映射
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """将同步数据库URL转换为对应的异步驱动URL"""
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+# 异步数据库连接URL（默认由同步URL推导）
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(SQLALCHEMY_DATABASE_URL))
+
+# 连接池配置
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+# 回收时间需小于MySQL的wait_timeout，避免使用已被服务端关闭的连接
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+# 每次借出连接都ping会多一次往返，默认关闭，改为只检查空闲超过阈值的连接
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+DB_POOL_IDLE_PING_SECONDS = float(os.getenv("DB_POOL_IDLE_PING_SECONDS", 60))
+
+
+def pool_options(url: str, label: str) -> dict:
+    """生成连接池参数，SQLite等不使用QueuePool的驱动不支持大小相关参数"""
+    poolclass = timed_pool_class(url, label)
+    options = {
+        "poolclass": poolclass,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    if make_url(url).get_backend_name() == "sqlite":
+        # 同步依赖的清理可能在另一个线程池线程中关闭连接，允许跨线程使用SQLite连接（每个连接同一时间只被一个会话使用）
+        options["connect_args"] = {"check_same_thread": False}
+    if issubclass(poolclass, QueuePool):
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+def install_idle_ping(sync_engine, label: str):
+    """连接空闲超过DB_POOL_IDLE_PING_SECONDS后再借出时才ping，失败时由连接池换一条新连接"""
+    if DB_POOL_PRE_PING or DB_POOL_IDLE_PING_SECONDS <= 0:
+        return
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info["last_checkin"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        last_checkin = connection_record.info.get("last_checkin")
+        if last_checkin is None or time.monotonic() - last_checkin < DB_POOL_IDLE_PING_SECONDS:
+            return
+        try:
+            # 连接已断开时do_ping返回False，其他错误直接抛出
+            alive = sync_engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            logger.warning(f"空闲连接ping失败: {str(e)}")
+            alive = False
+        if not alive:
+            metrics.db_pool_ping_failures_total.inc(engine=label)
+            logger.warning("空闲连接已失效，重新建立连接")
+            raise exc.DisconnectionError()
+
+
 # 创建数据库引擎，但暂时不实际连接
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    pool_pre_ping=True,  # 添加连接池预检查
-    pool_recycle=3600,   # 连接池回收时间
-)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **pool_options(SQLALCHEMY_DATABASE_URL, "sync"))
+
+# 创建异步数据库引擎，供async路由使用，避免在事件循环中阻塞
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL, "async"))
+
+install_idle_ping(engine, "sync")
+install_idle_ping(async_engine.sync_engine, "async")
+
+# 记录每个请求的SQL语句数、耗时和慢查询
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+register_pool_gauges({"sync": engine, "async": async_engine.sync_engine})
+
+
+def get_pool_stats() -> dict:
+    """返回两个连接池的当前状态，用于按负载调整连接池大小"""
+    stats = {}
+    for label, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+        stats[label] = {"status": pool.status()}
+        if isinstance(pool, QueuePool):
+            stats[label].update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+                max_overflow=DB_MAX_OVERFLOW,
+                timeout=DB_POOL_TIMEOUT,
+            )
+    return stats
+
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 创建异步会话工厂（提交后不过期对象，避免在响应序列化时触发隐式IO）
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 # 创建Base类，所有模型将继承此类
 Base = declarative_base()
 
@@ -40,28 +155,7 @@ def get_db():
     finally:
         db.close()
 
-# 初始化数据库连接（带重试机制）
-def init_db(max_retries=10, retry_interval=5):
-    """尝试连接数据库并创建表，带有重试机制"""
-    retries = 0
-    
-    while retries < max_retries:
-        try:
-            # 尝试连接数据库
-            with engine.connect() as connection:
-                logger.info("成功连接到MySQL数据库")
-                # 创建数据库表
-                Base.metadata.create_all(bind=engine)
-                logger.info("数据库表创建成功")
-                return True
-        except Exception as e:
-            retries += 1
-            logger.warning(f"连接MySQL失败 (尝试 {retries}/{max_retries}): {str(e)}")
-            if retries < max_retries:
-                logger.info(f"等待 {retry_interval} 秒后重试...")
-                time.sleep(retry_interval)
-            else:
-                logger.error("达到最大重试次数，无法连接到MySQL数据库")
-                raise
-    
-    return False
\ No newline at end of file
+# 获取异步数据库会话
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
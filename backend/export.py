@@ -0,0 +1,62 @@
+import csv
+import datetime
+import io
+import json
+from fastapi.responses import StreamingResponse
+
+# 每批从服务端游标读取的行数
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _ndjson_chunks(rows, fields):
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(dict(zip(fields, row)), default=_json_default, ensure_ascii=False))
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+def _csv_chunks(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # 写入BOM以便Excel正确识别UTF-8中文
+    buffer.write("\ufeff")
+    writer.writerow(fields)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_export(query, fields, fmt: str, filename: str) -> StreamingResponse:
+    """以流的形式导出查询结果
+
+    查询通过服务端游标(yield_per)分批读取，内存占用与总行数无关，
+    第一批数据读出后即开始发送响应。
+    """
+    rows = query.yield_per(EXPORT_BATCH_SIZE)
+    chunks = _csv_chunks(rows, fields) if fmt == "csv" else _ndjson_chunks(rows, fields)
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
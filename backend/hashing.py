@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 密码上下文
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# 哈希进程池配置：进程数默认等于CPU核数，排队任务数超过上限时直接拒绝
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", os.cpu_count() or 1))
+HASH_POOL_MAX_PENDING = int(os.getenv("HASH_POOL_MAX_PENDING", HASH_POOL_SIZE * 4))
+
+_executor = None
+_lock = threading.Lock()
+_pending = 0
+_stats = {
+    "completed": 0,
+    "rejected": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+    "run_seconds_total": 0.0,
+}
+
+
+def _hash(password):
+    """在工作进程中计算密码哈希，同时返回开始执行的时间用于统计排队耗时"""
+    return time.time(), pwd_context.hash(password)
+
+
+def _verify(plain_password, hashed_password):
+    """在工作进程中验证密码"""
+    return time.time(), pwd_context.verify(plain_password, hashed_password)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # 使用spawn启动工作进程，避免fork带有事件循环和线程的服务进程
+            _executor = ProcessPoolExecutor(
+                max_workers=HASH_POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _discard_executor(executor):
+    """工作进程异常退出（如OOM被杀）后进程池不可再用，丢弃它以便下次提交时重建"""
+    global _executor
+    with _lock:
+        if _executor is not executor:
+            return
+        _executor = None
+    logger.warning("密码哈希进程池已损坏，重建进程池")
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run(func, *args):
+    """在进程池中执行，进程池损坏时重建并重试一次"""
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    try:
+        return await loop.run_in_executor(executor, func, *args)
+    except BrokenProcessPool:
+        _discard_executor(executor)
+    return await loop.run_in_executor(_get_executor(), func, *args)
+
+
+async def _submit(func, *args):
+    """提交到哈希进程池执行，进程池饱和时返回503"""
+    global _pending
+    with _lock:
+        if _pending >= HASH_POOL_MAX_PENDING:
+            _stats["rejected"] += 1
+            metrics.password_hash_rejected_total.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="服务繁忙，请稍后重试",
+                headers={"Retry-After": "1"},
+            )
+        _pending += 1
+
+    submitted_at = time.time()
+    try:
+        started_at, result = await _run(func, *args)
+    finally:
+        with _lock:
+            _pending -= 1
+
+    finished_at = time.time()
+    wait = max(started_at - submitted_at, 0.0)
+    with _lock:
+        _stats["completed"] += 1
+        _stats["wait_seconds_total"] += wait
+        _stats["wait_seconds_max"] = max(_stats["wait_seconds_max"], wait)
+        _stats["run_seconds_total"] += finished_at - started_at
+    operation = func.__name__.lstrip("_")
+    metrics.password_hash_queue_wait_seconds.observe(wait, operation=operation)
+    metrics.password_hash_seconds.observe(finished_at - started_at, operation=operation)
+    logger.debug(f"密码哈希任务完成: 排队 {wait:.3f}s, 执行 {finished_at - started_at:.3f}s")
+    return result
+
+
+async def hash_password(password: str) -> str:
+    """在进程池中计算密码哈希"""
+    return await _submit(_hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """在进程池中验证密码"""
+    return await _submit(_verify, plain_password, hashed_password)
+
+
+def get_pool_stats() -> dict:
+    """返回哈希进程池的统计数据，用于按核数调整进程池大小"""
+    with _lock:
+        stats = dict(_stats)
+        stats["pending"] = _pending
+    stats["pool_size"] = HASH_POOL_SIZE
+    stats["max_pending"] = HASH_POOL_MAX_PENDING
+    completed = stats["completed"]
+    stats["wait_seconds_avg"] = stats["wait_seconds_total"] / completed if completed else 0.0
+    return stats
+
+
+def shutdown():
+    """关闭哈希进程池"""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
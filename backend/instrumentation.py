@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 慢查询阈值（毫秒），超过时记录语句（参数已脱敏）
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 200))
+
+
+class RequestSqlStats:
+    """单个请求内的SQL统计"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_statement = None
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, elapsed_ms: float):
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            if elapsed_ms > self.slowest_ms:
+                self.slowest_ms = elapsed_ms
+                self.slowest_statement = statement
+
+    def server_timing(self, total_ms: float) -> str:
+        """生成Server-Timing响应头"""
+        return (
+            f'db;dur={self.total_ms:.1f};desc="{self.count} queries", '
+            f'db-slowest;dur={self.slowest_ms:.1f}, '
+            f'total;dur={total_ms:.1f}'
+        )
+
+    def log_fields(self) -> dict:
+        return {
+            "db_queries": self.count,
+            "db_ms": round(self.total_ms, 2),
+            "db_slowest_ms": round(self.slowest_ms, 2),
+            "db_slowest_statement": _compact(self.slowest_statement),
+        }
+
+
+_request_stats: ContextVar[Optional[RequestSqlStats]] = ContextVar("request_sql_stats", default=None)
+
+
+def start_request() -> RequestSqlStats:
+    """为当前请求开始统计，返回的对象会在请求处理过程中被更新"""
+    stats = RequestSqlStats()
+    _request_stats.set(stats)
+    return stats
+
+
+def _compact(statement: Optional[str]) -> Optional[str]:
+    return " ".join(statement.split()) if statement else statement
+
+
+def _redact(parameters, executemany: bool) -> str:
+    """只记录参数个数，不记录参数值"""
+    if executemany:
+        return f"<已脱敏: {len(parameters)}组参数>"
+    return f"<已脱敏: {len(parameters) if parameters else 0}个参数>"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+    if elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+        logger.warning("slow_query " + json.dumps({
+            "duration_ms": round(elapsed_ms, 2),
+            "statement": _compact(statement),
+            "parameters": _redact(parameters, executemany),
+        }, ensure_ascii=False))
+
+
+def _handle_error(context):
+    # 执行失败时不会触发after_cursor_execute，需丢弃对应的开始时间
+    start_times = context.connection.info.get("query_start_time") if context.connection else None
+    if start_times:
+        start_times.pop()
+
+
+def instrument_engine(engine):
+    """在引擎上注册SQL耗时统计钩子（异步引擎传入其sync_engine）"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def timed_pool_class(url: str, label: str):
+    """返回该URL默认连接池类的子类，记录获取连接的等待时间"""
+    parsed = make_url(url)
+    pool_class = parsed.get_dialect().get_pool_class(parsed)
+
+    class TimedPool(pool_class):
+        def _do_get(self):
+            start_time = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                metrics.db_pool_timeouts_total.inc(engine=label)
+                raise
+            finally:
+                metrics.db_pool_checkout_wait_seconds.observe(time.perf_counter() - start_time, engine=label)
+
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+
+def register_pool_gauges(engines: dict):
+    """注册连接池状态指标，engines为{标签: 同步引擎}"""
+    def collect():
+        samples = []
+        for label, engine in engines.items():
+            pool = engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue
+            samples.append(("db_pool_checked_out", {"engine": label}, pool.checkedout()))
+            if hasattr(pool, "overflow"):
+                samples.append(("db_pool_overflow", {"engine": label}, pool.overflow()))
+                samples.append(("db_pool_size", {"engine": label}, pool.size()))
+        return samples
+
+    metrics.register_gauges(collect, {
+        "db_pool_checked_out": "当前被借出的连接数",
+        "db_pool_overflow": "当前超出pool_size的连接数",
+        "db_pool_size": "连接池容量",
+    })
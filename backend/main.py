@@ -1,10 +1,22 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
-from database import engine, Base, init_db
+from sqlalchemy import text
+from database import async_engine
 import models
+import hashing
 from routers import auth, users, contacts, articles
+from pagination import NEXT_CURSOR_HEADER
+from body_limits import BodySizeLimitMiddleware
+import migrate
+import storage
+import replicas
+import instrumentation
+import metrics
+import asyncio
+import json
 import logging
 import time
 
@@ -16,7 +28,8 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 # 创建FastAPI应用
-app = FastAPI(title="文章及用户管理系统API")
+# 默认使用orjson编码响应
+app = FastAPI(title="文章及用户管理系统API", default_response_class=ORJSONResponse)
 
 # 配置CORS
 app.add_middleware(
@@ -25,8 +38,58 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Server-Timing"],
 )
 
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+# 请求级统计：SQL统计通过Server-Timing响应头和结构化日志输出，延迟和状态码计入/metrics
+@app.middleware("http")
+async def request_instrumentation_middleware(request: Request, call_next):
+    stats = instrumentation.start_request()
+    start_time = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        _record_request_metrics(request, 500, time.perf_counter() - start_time)
+        raise
+    elapsed = time.perf_counter() - start_time
+    # 写请求成功后，该用户随后的读取在短时间内走主库
+    authorization = request.headers.get("authorization", "")
+    if request.method not in SAFE_METHODS and response.status_code < 400 and authorization.startswith("Bearer "):
+        replicas.mark_write(authorization[len("Bearer "):])
+    _record_request_metrics(request, response.status_code, elapsed)
+    # Server-Timing随响应头发送，只包含此前执行的查询；流式响应（如导出）的查询在发送响应体时才执行，
+    # 不计入该响应头，完整的统计见响应体发送完成后输出的日志
+    response.headers["Server-Timing"] = stats.server_timing(elapsed * 1000)
+    response.body_iterator = _log_after_body(response.body_iterator, request, response.status_code, stats, start_time)
+    return response
+
+
+async def _log_after_body(body_iterator, request: Request, status_code: int, stats, start_time: float):
+    """响应体发送完成后输出请求的SQL统计（包含流式响应在发送过程中执行的查询）"""
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        logger.info("request_sql " + json.dumps({
+            "method": request.method,
+            "path": request.url.path,
+            "status": status_code,
+            "total_ms": round((time.perf_counter() - start_time) * 1000, 2),
+            **stats.log_fields(),
+        }, ensure_ascii=False))
+
+
+def _record_request_metrics(request: Request, status_code: int, elapsed: float):
+    # 使用路由模板作为标签，避免路径参数导致标签数量无限增长
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    metrics.http_requests_total.inc(method=request.method, route=path, status=str(status_code))
+    metrics.http_request_duration_seconds.observe(elapsed, method=request.method, route=path)
+
 # 健康检查路由
 @app.get("/health")
 async def health_check():
@@ -35,6 +98,36 @@ async def health_check():
         "message": "FastAPI服务运行正常"
     }
 
+# 就绪检查：数据库可连接且已迁移到最新版本时返回200，否则返回503
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", 2))
+_schema_ready = False
+
+async def _check_database():
+    global _schema_ready
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        # 结构版本确认一次后不再重复检查
+        if not _schema_ready:
+            _schema_ready = await conn.run_sync(migrate.is_up_to_date)
+            if not _schema_ready:
+                raise RuntimeError("数据库结构未迁移到最新版本")
+
+@app.get("/ready")
+async def readiness_check():
+    try:
+        await asyncio.wait_for(_check_database(), timeout=READY_TIMEOUT)
+    except Exception as e:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "not_ready", "detail": str(e) or type(e).__name__},
+        )
+    return {"status": "ready"}
+
+# Prometheus指标
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # API版本前缀
 API_V1_PREFIX = "/api/v1"
 
@@ -44,23 +137,40 @@ app.include_router(users.router, prefix=API_V1_PREFIX)
 app.include_router(contacts.router, prefix=API_V1_PREFIX)
 app.include_router(articles.router, prefix=API_V1_PREFIX)
 
+# 在读取请求体之前拒绝超过上限的上传
+app.add_middleware(BodySizeLimitMiddleware, limits={
+    f"{API_V1_PREFIX}/users/avatar": users.AVATAR_MAX_BODY_BYTES,
+})
+
 # 启动事件
 @app.on_event("startup")
 async def startup_event():
     logger.info("FastAPI应用正在启动...")
     
-    # 尝试初始化数据库连接和表
-    try:
-        logger.info("尝试初始化数据库...")
-        init_db(max_retries=10, retry_interval=5)
-        logger.info("数据库初始化成功")
-    except Exception as e:
-        logger.error(f"数据库初始化失败: {str(e)}")
-        logger.warning("应用将继续启动，但部分功能可能不可用")
+    # 在后台线程中检查头像存储桶，不阻塞启动
+    asyncio.get_running_loop().run_in_executor(None, storage.warm_up)
+    
+    # 多worker模式下定期写出本进程的指标快照
+    if metrics.METRICS_MULTIPROC_DIR:
+        app.state.metrics_flush_task = asyncio.create_task(_flush_metrics_periodically())
     
     logger.info("FastAPI应用已启动")
 
+async def _flush_metrics_periodically():
+    while True:
+        await asyncio.sleep(metrics.METRICS_FLUSH_INTERVAL)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, metrics.flush)
+        except Exception as e:
+            logger.error(f"写入指标快照失败: {str(e)}")
+
 # 关闭事件
 @app.on_event("shutdown")
 async def shutdown_event():
+    # 释放异步连接池和密码哈希进程池
+    await async_engine.dispose()
+    await replicas.dispose()
+    hashing.shutdown()
+    if metrics.METRICS_MULTIPROC_DIR:
+        metrics.flush()
     logger.info("FastAPI应用已关闭")
\ No newline at end of file
@@ -0,0 +1,206 @@
+import glob
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 多worker部署时各进程把指标快照写入该目录，/metrics汇总所有进程的数据
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_metrics = {}
+_gauge_callbacks: List[Callable[[], List[Tuple[str, Dict[str, str], float]]]] = []
+_gauge_help = {}
+
+
+def _label_key(labels: dict) -> str:
+    return json.dumps(labels, sort_keys=True)
+
+
+class Counter:
+    """单调递增计数器"""
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.values = {}
+        _metrics[name] = self
+
+    def inc(self, value: float = 1.0, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0.0) + value
+
+    def snapshot(self) -> dict:
+        return dict(self.values)
+
+
+class Histogram:
+    """直方图，按桶累计观测值"""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.values = {}
+        _metrics[name] = self
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with _lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def snapshot(self) -> dict:
+        return {key: {"buckets": list(state["buckets"]), "sum": state["sum"], "count": state["count"]}
+                for key, state in self.values.items()}
+
+
+def register_gauges(callback, documentation: Dict[str, str]):
+    """注册在采集时计算的瞬时值，callback返回[(指标名, 标签, 值), ...]"""
+    _gauge_callbacks.append(callback)
+    _gauge_help.update(documentation)
+
+
+def _snapshot() -> dict:
+    gauges = {}
+    for callback in _gauge_callbacks:
+        try:
+            for name, labels, value in callback():
+                gauges.setdefault(name, {})[_label_key(labels)] = value
+        except Exception as e:
+            logger.error(f"采集指标失败: {e}")
+    with _lock:
+        return {
+            "pid": os.getpid(),
+            "metrics": {name: metric.snapshot() for name, metric in _metrics.items()},
+            "gauges": gauges,
+        }
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_MULTIPROC_DIR, f"metrics_{pid}.json")
+
+
+def flush():
+    """把当前进程的指标快照写入共享目录（多worker模式）"""
+    if not METRICS_MULTIPROC_DIR:
+        return
+    path = _snapshot_path(os.getpid())
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(_snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+
+def _collect_snapshots() -> list:
+    current = _snapshot()
+    if not METRICS_MULTIPROC_DIR:
+        return [current]
+    snapshots = [current]
+    for path in glob.glob(os.path.join(METRICS_MULTIPROC_DIR, "metrics_*.json")):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if snapshot["pid"] == current["pid"]:
+            continue
+        # 已退出进程的计数器仍计入总数，瞬时值则丢弃
+        if not _pid_alive(snapshot["pid"]):
+            snapshot["gauges"] = {}
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for name, value in sorted(labels.items()):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render() -> str:
+    """以Prometheus文本格式输出所有进程汇总后的指标"""
+    snapshots = _collect_snapshots()
+    multiprocess = len(snapshots) > 1 or bool(METRICS_MULTIPROC_DIR)
+    lines = []
+
+    for name, metric in sorted(_metrics.items()):
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.type}")
+        merged = {}
+        for snapshot in snapshots:
+            for key, value in snapshot["metrics"].get(name, {}).items():
+                if metric.type == "counter":
+                    merged[key] = merged.get(key, 0.0) + value
+                else:
+                    state = merged.setdefault(key, {"buckets": [0] * len(metric.buckets), "sum": 0.0, "count": 0})
+                    state["buckets"] = [a + b for a, b in zip(state["buckets"], value["buckets"])]
+                    state["sum"] += value["sum"]
+                    state["count"] += value["count"]
+        for key, value in sorted(merged.items()):
+            labels = json.loads(key)
+            if metric.type == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            for bound, count in zip(metric.buckets, value["buckets"]):
+                lines.append(f"{name}_bucket{_format_labels(dict(labels, le=str(bound)))} {count}")
+            lines.append(f"{name}_bucket{_format_labels(dict(labels, le='+Inf'))} {value['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+
+    gauge_names = sorted({name for snapshot in snapshots for name in snapshot["gauges"]})
+    for name in gauge_names:
+        lines.append(f"# HELP {name} {_gauge_help.get(name, name)}")
+        lines.append(f"# TYPE {name} gauge")
+        for snapshot in snapshots:
+            for key, value in sorted(snapshot["gauges"].get(name, {}).items()):
+                labels = json.loads(key)
+                if multiprocess:
+                    labels["pid"] = str(snapshot["pid"])
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+# 应用指标
+http_requests_total = Counter("http_requests_total", "按路由和状态码统计的请求数")
+http_request_duration_seconds = Histogram("http_request_duration_seconds", "按路由统计的请求耗时")
+db_pool_checkout_wait_seconds = Histogram(
+    "db_pool_checkout_wait_seconds", "从连接池获取连接的等待时间",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+db_pool_timeouts_total = Counter("db_pool_timeouts_total", "等待连接超过pool_timeout而失败的次数")
+db_pool_ping_failures_total = Counter("db_pool_ping_failures_total", "空闲连接ping失败并被替换的次数")
+db_read_route_total = Counter("db_read_route_total", "只读请求按目标库（副本或主库）及原因统计的次数")
+db_replica_failures_total = Counter("db_replica_failures_total", "只读副本连接失败被暂停使用的次数")
+password_hash_seconds = Histogram("password_hash_seconds", "bcrypt哈希/验证的执行时间")
+password_hash_queue_wait_seconds = Histogram("password_hash_queue_wait_seconds", "bcrypt任务在进程池中的排队时间")
+password_hash_rejected_total = Counter("password_hash_rejected_total", "哈希进程池饱和而被拒绝的请求数")
+s3_upload_duration_seconds = Histogram("s3_upload_duration_seconds", "上传到S3的耗时")
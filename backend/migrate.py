@@ -0,0 +1,194 @@
+"""数据库迁移
+
+用法:
+    python migrate.py           等待数据库可用并执行所有未应用的迁移
+    python migrate.py --status  查看各迁移是否已应用
+
+新增迁移时在MIGRATIONS末尾追加，已发布的迁移不要修改。每个迁移在执行前检查目标结构是否已存在，
+因此对新建的数据库（0001已按最新模型建表）和旧数据库都可以安全执行。
+"""
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, text
+from database import engine, Base
+import models  # 注册模型到Base.metadata
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", String(64), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# 多个实例同时执行迁移时用MySQL命名锁串行化
+_LOCK_NAME = "schema_migrations"
+_LOCK_TIMEOUT = 300
+
+
+def _has_column(conn, table: str, column: str) -> bool:
+    return any(item["name"] == column for item in inspect(conn).get_columns(table))
+
+
+def _has_index(conn, table: str, index: str) -> bool:
+    return any(item["name"] == index for item in inspect(conn).get_indexes(table))
+
+
+def _initial(conn):
+    # 新数据库按当前模型建表，已存在的表会被跳过
+    Base.metadata.create_all(bind=conn)
+
+
+def _articles_fulltext(conn):
+    if conn.dialect.name != "mysql" or _has_index(conn, "articles", "ix_articles_title_content_fulltext"):
+        return
+    conn.execute(text(
+        "ALTER TABLE articles ADD FULLTEXT INDEX ix_articles_title_content_fulltext (title, content) WITH PARSER ngram"
+    ))
+
+
+def _users_article_count(conn):
+    if _has_column(conn, "users", "article_count"):
+        return
+    conn.execute(text("ALTER TABLE users ADD COLUMN article_count INT NOT NULL DEFAULT 0"))
+    conn.execute(text("CREATE INDEX ix_users_article_count_id ON users (article_count, id)"))
+    conn.execute(text(
+        "UPDATE users SET article_count = (SELECT COUNT(*) FROM articles WHERE articles.author_id = users.id)"
+    ))
+
+
+def _users_avatar_hash(conn):
+    if _has_column(conn, "users", "avatar_hash"):
+        return
+    conn.execute(text("ALTER TABLE users ADD COLUMN avatar_hash VARCHAR(64) NULL"))
+
+
+def _composite_indexes(conn):
+    created = {
+        "articles": [("ix_articles_author_id_id", "author_id, id")],
+        "contacts": [("ix_contacts_user_id_id", "user_id, id"), ("ix_contacts_user_id_name", "user_id, name")],
+    }
+    for table, indexes in created.items():
+        for name, columns in indexes:
+            if not _has_index(conn, table, name):
+                conn.execute(text(f"CREATE INDEX {name} ON {table} ({columns})"))
+
+    # 删除被新索引覆盖或没有查询使用的索引，减少写入开销：
+    # 主键上重复的普通索引、仅含外键列的索引（MySQL为外键自动创建）、未被使用的标题和姓名单列索引
+    redundant = {
+        "users": [["id"]],
+        "articles": [["id"], ["title"], ["author_id"]],
+        "contacts": [["id"], ["name"], ["user_id"]],
+    }
+    for table, column_sets in redundant.items():
+        for index in inspect(conn).get_indexes(table):
+            if index["column_names"] in column_sets and not index.get("unique"):
+                conn.execute(text(f"DROP INDEX {index['name']} ON {table}")
+                             if conn.dialect.name == "mysql" else text(f"DROP INDEX {index['name']}"))
+
+
+def _version_columns(conn):
+    for table in ("users", "articles", "contacts"):
+        if not _has_column(conn, table, "version"):
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN version INT NOT NULL DEFAULT 1"))
+
+
+# (版本号, 说明, 执行函数)
+MIGRATIONS = [
+    ("0001_initial", "按模型创建所有表", _initial),
+    ("0002_articles_fulltext", "文章标题和正文全文索引（ngram解析器支持中文）", _articles_fulltext),
+    ("0003_users_article_count", "作者文章数计数器，并根据现有文章回填", _users_article_count),
+    ("0004_users_avatar_hash", "头像内容哈希（用于去重和缩略图）", _users_avatar_hash),
+    ("0005_composite_indexes", "按查询模式建立复合索引并删除冗余索引", _composite_indexes),
+    ("0006_version_columns", "用户、文章和联系人的乐观锁版本号", _version_columns),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def applied_versions(conn) -> set:
+    """返回已应用的迁移版本号，迁移表不存在时返回空集合"""
+    if not inspect(conn).has_table(schema_migrations.name):
+        return set()
+    return {row.version for row in conn.execute(schema_migrations.select())}
+
+
+def is_up_to_date(conn) -> bool:
+    """数据库结构是否已迁移到最新版本（供就绪检查使用）"""
+    return LATEST_VERSION in applied_versions(conn)
+
+
+def wait_for_database(max_retries: int = 10, retry_interval: int = 5):
+    """等待数据库可连接"""
+    for attempt in range(1, max_retries + 1):
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            logger.info("成功连接到数据库")
+            return
+        except Exception as e:
+            logger.warning(f"连接数据库失败 (尝试 {attempt}/{max_retries}): {str(e)}")
+            if attempt == max_retries:
+                logger.error("达到最大重试次数，无法连接到数据库")
+                raise
+            logger.info(f"等待 {retry_interval} 秒后重试...")
+            time.sleep(retry_interval)
+
+
+def migrate():
+    """执行所有未应用的迁移"""
+    with engine.connect() as conn:
+        use_lock = conn.dialect.name == "mysql"
+        if use_lock and not conn.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"), {"name": _LOCK_NAME, "timeout": _LOCK_TIMEOUT}
+        ).scalar():
+            raise RuntimeError("等待迁移锁超时，可能有其他实例正在执行迁移")
+        try:
+            with conn.begin():
+                _metadata.create_all(bind=conn)
+            applied = applied_versions(conn)
+            for version, description, apply in MIGRATIONS:
+                if version in applied:
+                    continue
+                logger.info(f"执行迁移 {version}: {description}")
+                # MySQL的DDL会隐式提交，版本记录在迁移成功后单独写入
+                with conn.begin():
+                    apply(conn)
+                with conn.begin():
+                    conn.execute(schema_migrations.insert().values(version=version, applied_at=datetime.utcnow()))
+            logger.info(f"数据库结构已是最新版本: {LATEST_VERSION}")
+        finally:
+            if use_lock:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": _LOCK_NAME})
+
+
+def print_status():
+    with engine.connect() as conn:
+        applied = applied_versions(conn)
+    for version, description, _ in MIGRATIONS:
+        mark = "x" if version in applied else " "
+        print(f"[{mark}] {version}  {description}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="数据库迁移")
+    parser.add_argument("--status", action="store_true", help="查看迁移状态")
+    parser.add_argument("--max-retries", type=int, default=10, help="等待数据库可用的最大重试次数")
+    parser.add_argument("--retry-interval", type=int, default=5, help="重试间隔（秒）")
+    args = parser.parse_args()
+
+    wait_for_database(args.max_retries, args.retry_interval)
+    if args.status:
+        print_status()
+    else:
+        try:
+            migrate()
+        except Exception as e:
+            logger.error(f"迁移失败: {str(e)}")
+            sys.exit(1)
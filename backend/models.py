@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, Date, func
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, Date, Index, func
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -8,13 +8,19 @@ class User(Base):
     """用户模型"""
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     username = Column(String(50), unique=True, index=True, nullable=False)
     email = Column(String(100), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     birthday = Column(Date, nullable=True)
     avatar_url = Column(String(255), nullable=True)
+    # 头像原图的内容哈希，衍生图按此哈希存储
+    avatar_hash = Column(String(64), nullable=True)
     balance = Column(Float, default=0.0)
+    # 文章数计数器，由创建/删除文章时维护，避免统计时全表聚合
+    article_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # 乐观锁版本号，每次更新资料时递增
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
@@ -22,35 +28,61 @@ class User(Base):
     articles = relationship("Article", back_populates="author")
     contacts = relationship("Contact", back_populates="user")
 
+    __table_args__ = (
+        # 作者统计按文章数排序分页
+        Index("ix_users_article_count_id", "article_count", "id"),
+    )
+
 
 class Article(Base):
     """文章模型"""
     __tablename__ = "articles"
 
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String(255), index=True, nullable=False)
+    id = Column(Integer, primary_key=True)
+    title = Column(String(255), nullable=False)
     content = Column(Text, nullable=True)
     author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # 乐观锁版本号，每次更新时递增
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
     # 关系
     author = relationship("User", back_populates="articles")
 
+    __table_args__ = (
+        # 标题和正文的全文索引，使用ngram解析器以支持中文分词
+        Index(
+            "ix_articles_title_content_fulltext", "title", "content",
+            mysql_prefix="FULLTEXT", mysql_with_parser="ngram",
+        ),
+        # 按作者筛选并按ID游标分页，同时满足外键对author_id索引的要求
+        Index("ix_articles_author_id_id", "author_id", "id"),
+    )
+
 
 class Contact(Base):
     """联系人模型"""
     __tablename__ = "contacts"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    name = Column(String(100), index=True, nullable=False)
+    name = Column(String(100), nullable=False)
     province = Column(String(50), nullable=True)
     city = Column(String(50), nullable=True)
     address = Column(String(200), nullable=True)
     postal_code = Column(String(20), nullable=True)
+    # 乐观锁版本号，每次更新时递增
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
     # 关系
-    user = relationship("User", back_populates="contacts")
\ No newline at end of file
+    user = relationship("User", back_populates="contacts")
+
+    __table_args__ = (
+        # 联系人总是按所属用户查询：按ID游标分页和归属检查
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        # 按姓名搜索时只扫描该用户的索引项
+        Index("ix_contacts_user_id_name", "user_id", "name"),
+    )
\ No newline at end of file
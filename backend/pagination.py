@@ -0,0 +1,46 @@
+import base64
+import json
+import os
+from typing import Optional
+from fastapi import HTTPException, Response
+
+# 下一页游标通过响应头返回，保持列表响应体的结构不变
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# 列表接口每页最多返回的行数
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", 1000))
+
+
+def encode_cursor(values: dict) -> str:
+    """将游标内容编码为不透明字符串"""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """解析游标字符串，格式错误时返回400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, dict) or not isinstance(values.get("id"), int):
+            raise ValueError(cursor)
+        return values
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def paginate_by_id(query, id_column, response: Response, limit: int, skip: int = 0, cursor: Optional[str] = None):
+    """按主键分页：传入游标时使用索引定位(id > 游标)，否则兼容原有的skip/limit
+
+    多取一行用于判断是否还有下一页，存在时在响应头中返回下一页游标。
+    """
+    query = query.order_by(id_column)
+    if cursor:
+        query = query.filter(id_column > decode_cursor(cursor)["id"])
+    elif skip:
+        query = query.offset(skip)
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if has_more and rows:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"id": rows[-1].id})
+    return rows
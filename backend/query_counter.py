@@ -0,0 +1,92 @@
+import re
+from contextlib import contextmanager
+from sqlalchemy import event
+import database
+
+
+class QueryCounter:
+    """统计代码块内各引擎执行的SQL语句
+
+    监听器注册在引擎上，会统计期间所有请求的语句，适用于顺序执行的测试和基准场景。
+    """
+
+    def __init__(self, *engines):
+        self.engines = engines or (database.engine, database.async_engine.sync_engine)
+        self.statements = []
+        self.executions = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+        self.executions.append((statement, parameters, executemany))
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._on_execute)
+        return False
+
+
+@contextmanager
+def assert_max_queries(limit: int, *engines):
+    """代码块内执行的SQL语句超过limit条时抛出AssertionError"""
+    with QueryCounter(*engines) as counter:
+        yield counter
+    if counter.count > limit:
+        statements = "\n".join(f"  {statement}" for statement in counter.statements)
+        raise AssertionError(f"执行了{counter.count}条SQL语句，超过上限{limit}条:\n{statements}")
+
+
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|UPDATE|DELETE)\b", re.IGNORECASE)
+_SQLITE_FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+def full_scans(statement: str, parameters, engine=None) -> list:
+    """用EXPLAIN检查语句，返回执行计划中全表扫描的表名
+
+    MySQL下为type=ALL的表；SQLite下为不经过任何索引的SCAN（按主键顺序带LIMIT的扫描也会被计入）。
+    """
+    engine = engine or database.engine
+    with engine.connect() as conn:
+        if conn.dialect.name == "mysql":
+            rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters).mappings().all()
+            return [row["table"] for row in rows if row["type"] == "ALL"]
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        return [match.group(1) for match in (_SQLITE_FULL_SCAN.match(row[-1]) for row in rows) if match]
+
+
+def scanned_statements(executions, allow=()) -> list:
+    """逐条EXPLAIN执行过的SELECT/UPDATE/DELETE（批量执行的语句除外，相同语句和参数只检查一次）
+
+    返回存在全表扫描的(表名列表, 语句)，allow为允许全表扫描的表名。
+    检查在同步引擎上进行，异步驱动与同步驱动的参数格式相同。
+    """
+    problems = []
+    checked = set()
+    for statement, parameters, executemany in executions:
+        if executemany or not _EXPLAINABLE.match(statement) or (statement, repr(parameters)) in checked:
+            continue
+        checked.add((statement, repr(parameters)))
+        tables = [table for table in full_scans(statement, parameters) if table not in allow]
+        if tables:
+            problems.append((tables, " ".join(statement.split())))
+    return problems
+
+
+@contextmanager
+def assert_queries_use_index(*engines, allow=()):
+    """代码块内的查询出现全表扫描时抛出AssertionError，allow为允许全表扫描的表名"""
+    with QueryCounter(*engines) as counter:
+        yield counter
+    problems = scanned_statements(counter.executions, allow)
+    if problems:
+        raise AssertionError("以下查询存在全表扫描:\n" + "\n".join(
+            f"  [{', '.join(tables)}] {statement}" for tables, statement in problems
+        ))
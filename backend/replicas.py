@@ -0,0 +1,212 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from fastapi import Depends
+from jose import JWTError
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.ext.asyncio import create_async_engine
+from database import SessionLocal, AsyncSessionLocal, to_async_url, pool_options, install_idle_ping
+from instrumentation import instrument_engine, register_pool_gauges
+from auth import oauth2_scheme, decode_access_token
+from response_cache import response_cache
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 只读副本URL（逗号分隔，使用同步驱动URL，异步URL自动推导），未配置时所有读取都走主库
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# 副本连接失败后暂停使用的时间（秒），之后再次尝试
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", 30))
+# 用户写入后在该时间内的读取仍走主库，保证读到自己的写入
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+# 由副本数据生成的响应缓存有效期（秒），避免把复制延迟期间的旧数据长期缓存
+REPLICA_CACHE_TTL = int(os.getenv("REPLICA_CACHE_TTL", 10))
+
+_STICKY_PREFIX = "rw:"
+
+
+class Replica:
+    """一个只读副本及其同步、异步引擎"""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = create_engine(url, **pool_options(url, name))
+        async_url = to_async_url(url)
+        self.async_engine = create_async_engine(async_url, **pool_options(async_url, f"{name}-async"))
+        self.down_until = 0.0
+        for sync_engine in (self.engine, self.async_engine.sync_engine):
+            install_idle_ping(sync_engine, name)
+            instrument_engine(sync_engine)
+            event.listen(sync_engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        # 查询过程中连接断开时同样暂停使用该副本
+        if context.is_disconnect:
+            _router.mark_down(self, context.original_exception)
+
+    @property
+    def healthy(self) -> bool:
+        return self.down_until <= time.monotonic()
+
+
+class ReplicaRouter:
+    """按轮询顺序选择健康的副本，全部不可用时由调用方回退到主库"""
+
+    def __init__(self, replicas):
+        self.replicas = replicas
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def candidates(self):
+        if not self.replicas:
+            return []
+        with self._lock:
+            start = next(self._counter) % len(self.replicas)
+        ordered = self.replicas[start:] + self.replicas[:start]
+        return [replica for replica in ordered if replica.healthy]
+
+    def mark_down(self, replica: Replica, error):
+        if not replica.healthy:
+            return
+        replica.down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+        metrics.db_replica_failures_total.inc(replica=replica.name)
+        logger.warning(f"只读副本 {replica.name} 不可用，{REPLICA_RETRY_SECONDS:.0f}秒内改用其他副本或主库: {error}")
+
+
+_router = ReplicaRouter([Replica(f"replica{index}", url) for index, url in enumerate(DATABASE_REPLICA_URLS, 1)])
+if _router.replicas:
+    # 版本号变更后的REPLICA_STICKY_SECONDS内，副本可能还没有同步该变更
+    response_cache.recent_bump_seconds = REPLICA_STICKY_SECONDS
+register_pool_gauges({replica.name: replica.engine for replica in _router.replicas})
+register_pool_gauges({f"{replica.name}-async": replica.async_engine.sync_engine for replica in _router.replicas})
+
+
+def _token_username(token: str) -> str:
+    try:
+        return decode_access_token(token).get("sub")
+    except JWTError:
+        return None
+
+
+def mark_write(token: str):
+    """记录用户刚发生写入；标记存放在响应缓存后端，使用Redis时在多个worker间共享"""
+    if not _router.replicas:
+        return
+    username = _token_username(token)
+    if username:
+        try:
+            response_cache.backend.set(_STICKY_PREFIX + username, b"1", ex=REPLICA_STICKY_SECONDS)
+        except Exception as e:
+            logger.error(f"记录写入标记失败: {username}: {e}")
+
+
+def _recently_wrote(token: str) -> bool:
+    username = _token_username(token)
+    if not username:
+        return False
+    try:
+        return response_cache.backend.get(_STICKY_PREFIX + username) is not None
+    except Exception as e:
+        logger.error(f"读取写入标记失败: {username}: {e}")
+        return True
+
+
+def _read_candidates(token: str):
+    """返回(可用的副本列表, 是否因用户刚写入而必须读主库)"""
+    if not _router.replicas:
+        return [], False
+    if _recently_wrote(token):
+        metrics.db_read_route_total.inc(target="primary", reason="recent_write")
+        return [], True
+    candidates = _router.candidates()
+    if not candidates:
+        metrics.db_read_route_total.inc(target="primary", reason="no_healthy_replica")
+    return candidates, False
+
+
+def read_cache_ttl(db):
+    """返回由该会话读取的数据生成的响应缓存有效期，主库会话返回None使用默认值"""
+    return REPLICA_CACHE_TTL if db.info.get("replica") else None
+
+
+def cache_readable(db) -> bool:
+    """能否从响应缓存读取：刚写入的用户跳过缓存直接读主库，缓存中可能是其他请求从未同步的副本生成的旧数据"""
+    return not db.info.get("recent_write")
+
+
+def cache_writable(db, deps: dict) -> bool:
+    """能否把本次读取的结果写入响应缓存
+
+    刚写入的用户不写缓存；副本读取的结果只在依赖的命名空间最近没有变更时写入，
+    否则副本可能尚未同步该变更，旧数据会以新版本号被缓存。
+    """
+    if db.info.get("recent_write"):
+        return False
+    return not (db.info.get("replica") and response_cache.recently_bumped(*deps))
+
+
+# 获取只读数据库会话（副本不可用或用户刚写入时使用主库）
+def get_read_db(token: str = Depends(oauth2_scheme)):
+    candidates, recent_write = _read_candidates(token)
+    for replica in candidates:
+        try:
+            connection = replica.engine.connect()
+        except exc.DBAPIError as e:
+            _router.mark_down(replica, e)
+            continue
+        metrics.db_read_route_total.inc(target=replica.name, reason="replica")
+        db = SessionLocal(bind=connection)
+        db.info["replica"] = replica.name
+        try:
+            yield db
+        finally:
+            db.close()
+            connection.close()
+        return
+
+    db = SessionLocal()
+    db.info["recent_write"] = recent_write
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# 获取异步只读数据库会话
+async def get_async_read_db(token: str = Depends(oauth2_scheme)):
+    candidates, recent_write = _read_candidates(token)
+    for replica in candidates:
+        try:
+            connection = await replica.async_engine.connect()
+        except exc.DBAPIError as e:
+            _router.mark_down(replica, e)
+            continue
+        metrics.db_read_route_total.inc(target=replica.name, reason="replica")
+        try:
+            async with AsyncSessionLocal(bind=connection) as db:
+                db.info["replica"] = replica.name
+                yield db
+        finally:
+            await connection.close()
+        return
+
+    async with AsyncSessionLocal() as db:
+        db.info["recent_write"] = recent_write
+        yield db
+
+
+async def dispose():
+    """释放所有副本的连接池"""
+    for replica in _router.replicas:
+        replica.engine.dispose()
+        await replica.async_engine.dispose()
+
+
+def sync_engines() -> list:
+    """返回所有副本的同步引擎（包括异步引擎底层的同步引擎），用于统计执行的语句"""
+    engines = []
+    for replica in _router.replicas:
+        engines.extend((replica.engine, replica.async_engine.sync_engine))
+    return engines
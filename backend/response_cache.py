@@ -0,0 +1,233 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Request, Response
+from cache import TTLCache
+from versioning import format_etag
+
+logger = logging.getLogger(__name__)
+
+# 响应缓存配置
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 300))
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_SIZE", 10000))
+# 进程内后端最多保留的版本号数量（每个被修改过的文章、用户各占一个）
+RESPONSE_CACHE_VERSION_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_VERSION_MAX_SIZE", 100000))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+_VERSION_PREFIX = "ver:"
+_ENTRY_PREFIX = "resp:"
+_BUMPED_PREFIX = "bumped:"
+
+
+class VersionStore:
+    """有数量上限的版本号存储
+
+    超出上限时淘汰最久未使用的版本号，并把下限提高到被淘汰的值，未记录的键返回该下限。
+    因此同一个键读到的版本号不会变小，递增后一定大于之前读到的值：淘汰只会让部分缓存条目提前失效，
+    不会让旧条目重新被判定为有效。
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._versions = OrderedDict()
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            value = self._versions.get(key)
+            if value is None:
+                return self._floor
+            self._versions.move_to_end(key)
+            return value
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = self._versions.get(key, self._floor) + 1
+            self._versions[key] = value
+            self._versions.move_to_end(key)
+            while len(self._versions) > self.maxsize:
+                _, evicted = self._versions.popitem(last=False)
+                self._floor = max(self._floor, evicted)
+            return value
+
+
+class MemoryBackend:
+    """进程内LRU后端，仅在单个worker内共享"""
+
+    def __init__(self, maxsize: int, version_maxsize: int = RESPONSE_CACHE_VERSION_MAX_SIZE):
+        self._entries = TTLCache(maxsize=maxsize)
+        self._versions = VersionStore(version_maxsize)
+
+    def get(self, key: str) -> Optional[bytes]:
+        if key.startswith(_VERSION_PREFIX):
+            return str(self._versions.get(key)).encode()
+        return self._entries.get(key)
+
+    def set(self, key: str, value: bytes, ex: int = None):
+        self._entries.set(key, value, ttl=ex)
+
+    def incr(self, key: str) -> int:
+        return self._versions.incr(key)
+
+
+class RedisBackend:
+    """Redis兼容后端，多个worker共享缓存和版本号
+
+    client需要提供redis-py风格的get/set(ex=)/incr方法。版本号不设有效期而缓存条目都带有效期，
+    Redis应使用volatile-lru等只淘汰带有效期键的策略，否则版本号被淘汰后会从0重新计数，旧条目可能重新生效。
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ex: int = None):
+        self._client.set(key, value, ex=ex)
+
+    def incr(self, key: str) -> int:
+        return self._client.incr(key)
+
+
+class FakeRedis:
+    """本地开发用的Redis替身，实现RedisBackend所需的命令子集
+
+    与volatile-lru策略下的Redis一致，版本号与缓存条目分开存放，淘汰缓存条目不会重置版本号。
+    """
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_MAX_SIZE, version_maxsize: int = RESPONSE_CACHE_VERSION_MAX_SIZE):
+        self._data = TTLCache(maxsize=maxsize, ttl=float("inf"))
+        self._counters = VersionStore(version_maxsize)
+
+    def get(self, key):
+        if key.startswith(_VERSION_PREFIX):
+            return str(self._counters.get(key)).encode()
+        return self._data.get(key)
+
+    def set(self, key, value, ex=None):
+        self._data.set(key, value if isinstance(value, bytes) else str(value).encode(), ttl=ex)
+
+    def incr(self, key):
+        return self._counters.incr(key)
+
+
+def _create_backend():
+    if RESPONSE_CACHE_BACKEND == "redis":
+        import redis
+        return RedisBackend(redis.Redis.from_url(REDIS_URL))
+    if RESPONSE_CACHE_BACKEND == "fake-redis":
+        return RedisBackend(FakeRedis())
+    return MemoryBackend(RESPONSE_CACHE_MAX_SIZE)
+
+
+class ResponseCache:
+    """带ETag的响应缓存
+
+    每个缓存条目记录生成时依赖的版本号（如article:1、user:2），写操作递增对应版本号，
+    读取时任一依赖版本变化即视为失效。ETag由缓存键、依赖版本号和updated_at计算得到。
+    """
+
+    def __init__(self, backend, ttl: int = RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        # 大于0时，版本号变更后在该时间内保留"最近变更"标记（供只读副本判断数据是否可能尚未同步）
+        self.recent_bump_seconds = 0
+
+    def version(self, namespace: str) -> int:
+        value = self.backend.get(_VERSION_PREFIX + namespace)
+        return int(value) if value else 0
+
+    def versions(self, *namespaces: str) -> dict:
+        return {namespace: self.version(namespace) for namespace in namespaces}
+
+    def bump(self, *namespaces: str):
+        """数据变更后使依赖这些命名空间的缓存失效"""
+        for namespace in namespaces:
+            try:
+                self.backend.incr(_VERSION_PREFIX + namespace)
+                if self.recent_bump_seconds > 0:
+                    self.backend.set(_BUMPED_PREFIX + namespace, b"1", ex=self.recent_bump_seconds)
+            except Exception as e:
+                logger.error(f"更新缓存版本失败: {namespace}: {e}")
+
+    def recently_bumped(self, *namespaces: str) -> bool:
+        """这些命名空间是否在recent_bump_seconds内发生过变更，读取失败时按发生过变更处理"""
+        try:
+            return any(self.backend.get(_BUMPED_PREFIX + namespace) is not None for namespace in namespaces)
+        except Exception as e:
+            logger.error(f"读取缓存变更标记失败: {e}")
+            return True
+
+    def get(self, key: str) -> Optional[dict]:
+        """读取缓存条目，依赖版本已变化时返回None"""
+        try:
+            raw = self.backend.get(_ENTRY_PREFIX + key)
+        except Exception as e:
+            logger.error(f"读取响应缓存失败: {key}: {e}")
+            return None
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        for namespace, version in entry["deps"].items():
+            if self.version(namespace) != version:
+                return None
+        return entry
+
+    def put(self, key: str, body: str, deps: dict, updated_at=None, ttl: int = None, version: int = None,
+            store: bool = True) -> dict:
+        """写入缓存条目，deps为生成响应前读取的版本号，ttl为空时使用默认有效期
+
+        传入资源的版本号时ETag以版本号开头，客户端可直接用于更新请求的If-Match。
+        store为False时只生成条目（用于响应）而不写入缓存。
+        """
+        entry = {
+            "etag": self.etag(key, deps, updated_at, version),
+            "deps": deps,
+            "body": body,
+        }
+        if not store:
+            return entry
+        try:
+            self.backend.set(_ENTRY_PREFIX + key, json.dumps(entry).encode(), ex=ttl or self.ttl)
+        except Exception as e:
+            logger.error(f"写入响应缓存失败: {key}: {e}")
+        return entry
+
+    @staticmethod
+    def etag(key: str, deps: dict, updated_at=None, version: int = None) -> str:
+        """由缓存键、依赖版本号和updated_at计算ETag
+
+        写接口返回的ETag也用它计算，与随后GET返回的ETag一致，客户端可直接用于If-None-Match。
+        """
+        fingerprint = f"{key}|{sorted(deps.items())}|{updated_at}"
+        digest = hashlib.sha1(fingerprint.encode()).hexdigest()
+        return format_etag(version, digest[:16]) if version is not None else f'"{digest}"'
+
+    @staticmethod
+    def respond(request: Request, entry: dict) -> Response:
+        """客户端持有相同ETag时返回304，否则返回缓存的响应体"""
+        headers = {"ETag": entry["etag"], "Cache-Control": "private, no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            tags = [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+            if "*" in tags or entry["etag"] in tags:
+                return Response(status_code=304, headers=headers)
+        return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+
+def serialize(schema, obj) -> str:
+    """按响应Schema序列化ORM对象或对象列表"""
+    if isinstance(obj, list):
+        return "[" + ",".join(schema.from_orm(item).json() for item in obj) + "]"
+    return schema.from_orm(obj).json()
+
+
+response_cache = ResponseCache(_create_backend())
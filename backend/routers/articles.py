@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy.orm import Session, joinedload
 import models
 import schemas
 from database import get_db
+from replicas import cache_readable, cache_writable, get_read_db, read_cache_ttl
 from auth import get_current_user
+from pagination import PAGE_SIZE_MAX, paginate_by_id
+from export import stream_export
+from response_cache import response_cache, serialize
+from serialization import ARTICLE_FIELDS, dumps, json_response, project, user_dict
+from versioning import if_match_versions, precondition_failed, versioned_update
 from typing import List, Optional
-from sqlalchemy import func
+from sqlalchemy import func, or_
+from sqlalchemy.dialects.mysql import match
+import os
 
 router = APIRouter(
     prefix="/articles",
@@ -13,29 +21,110 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# 摘要模式下正文最多截取的字符数
+ARTICLE_EXCERPT_MAX = 2000
+# 与MySQL的ngram_token_size一致，比它短的搜索词无法用ngram全文索引查找
+FULLTEXT_NGRAM_TOKEN_SIZE = int(os.getenv("FULLTEXT_NGRAM_TOKEN_SIZE", 2))
 
-@router.get("/", response_model=List[schemas.ArticleResponse])
+
+@router.get("/", response_model=List[schemas.ArticleListItem])
 def get_articles(
-    skip: int = 0,
-    limit: int = 100,
-    search: Optional[str] = Query(None, description="按标题搜索"),
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(None, description="分页游标（取自上一页响应头X-Next-Cursor），传入时忽略skip"),
+    search: Optional[str] = Query(None, description="按标题和正文全文搜索"),
     author_id: Optional[int] = Query(None, description="按作者ID筛选"),
+    include_author: bool = Query(False, description="是否同时返回作者信息"),
+    fields: Optional[str] = Query(None, description="只返回指定字段（逗号分隔，如id,title），id总是返回"),
+    excerpt: Optional[int] = Query(None, ge=1, le=ARTICLE_EXCERPT_MAX, description="正文只返回前N个字符"),
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """获取文章列表"""
-    query = db.query(models.Article)
+    """获取文章列表（只查询需要的列，直接投影为dict并用orjson编码）"""
+    output_fields = _parse_fields(fields)
+    
+    # 不需要的列不出现在SELECT中；摘要模式在数据库中截取正文，减少传输的数据量
+    columns = []
+    for name in output_fields:
+        if name == "content" and excerpt:
+            columns.append(func.substr(models.Article.content, 1, excerpt).label("content"))
+        else:
+            columns.append(getattr(models.Article, name))
+    if include_author and "author_id" not in output_fields:
+        columns.append(models.Article.author_id)
+    query = db.query(*columns)
     
     # 如果指定了作者ID，则只获取该作者的文章
     if author_id is not None:
         query = query.filter(models.Article.author_id == author_id)
     
-    # 如果有搜索关键词，按标题进行模糊搜索
+    # 如果有搜索关键词，对标题和正文进行全文搜索
     if search:
-        query = query.filter(models.Article.title.ilike(f"%{search}%"))
+        relevance = _search_relevance(db, search)
+        if relevance is not None:
+            query = query.filter(relevance)
+            # 未使用游标时按相关度排序
+            if not cursor:
+                articles = query.order_by(relevance.desc(), models.Article.id).offset(skip).limit(limit).all()
+                return _articles_response(db, articles, output_fields, include_author, response)
+        else:
+            query = query.filter(or_(
+                models.Article.title.ilike(f"%{search}%"),
+                models.Article.content.ilike(f"%{search}%"),
+            ))
     
-    articles = query.offset(skip).limit(limit).all()
-    return articles
+    articles = paginate_by_id(query, models.Article.id, response, limit, skip=skip, cursor=cursor)
+    return _articles_response(db, articles, output_fields, include_author, response)
+
+
+def _parse_fields(fields: Optional[str]) -> List[str]:
+    """解析fields参数，按响应字段的顺序返回，未指定时返回全部字段"""
+    if not fields:
+        return ARTICLE_FIELDS
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(ARTICLE_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"未知的字段: {', '.join(sorted(unknown))}，可选字段: {', '.join(ARTICLE_FIELDS)}"
+        )
+    requested.add("id")
+    return [name for name in ARTICLE_FIELDS if name in requested]
+
+
+def _articles_response(db: Session, articles, output_fields: List[str], include_author: bool, response: Response):
+    authors = {}
+    if include_author:
+        # 需要作者信息时用一条IN查询批量加载，避免逐条查询产生N+1查询
+        author_ids = {article.author_id for article in articles}
+        if author_ids:
+            authors = {
+                user.id: user_dict(user)
+                for user in db.query(models.User).filter(models.User.id.in_(author_ids))
+            }
+    items = []
+    for article in articles:
+        item = project(article, output_fields)
+        item["author"] = authors.get(article.author_id) if include_author else None
+        items.append(item)
+    return json_response(items, response)
+
+
+def _search_relevance(db: Session, search: str):
+    """MySQL下返回基于FULLTEXT索引的MATCH相关度表达式，其他数据库（如本地SQLite）返回None
+
+    使用布尔模式并把搜索词作为短语：自然语言模式下ngram分词后的各个片段是"或"的关系，
+    搜索"数据库"也会匹配只包含"数据"的文章；短语要求所有片段连续出现，与LIKE子串搜索的含义一致。
+    短于ngram_token_size的搜索词返回None，退回LIKE。
+    """
+    if db.get_bind().dialect.name != "mysql":
+        return None
+    # 短语内只有双引号是特殊字符
+    phrase = search.replace('"', " ").strip()
+    if len(phrase) < FULLTEXT_NGRAM_TOKEN_SIZE:
+        return None
+    return match(models.Article.title, models.Article.content, against=f'"{phrase}"').in_boolean_mode()
 
 
 @router.post("/", response_model=schemas.ArticleResponse, status_code=status.HTTP_201_CREATED)
@@ -47,49 +136,91 @@ def create_article(
     """创建新文章"""
     db_article = models.Article(**article.dict(), author_id=current_user.id)
     db.add(db_article)
+    _adjust_article_count(db, current_user.id, 1)
     db.commit()
+    response_cache.bump("author_stats")
     db.refresh(db_article)
     return db_article
 
 
+@router.get("/export")
+def export_articles(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="导出格式"),
+    author_id: Optional[int] = Query(None, description="按作者ID筛选"),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """流式导出文章"""
+    columns = [
+        models.Article.id,
+        models.Article.title,
+        models.Article.content,
+        models.Article.author_id,
+        models.Article.created_at,
+        models.Article.updated_at,
+    ]
+    query = db.query(*columns)
+    if author_id is not None:
+        query = query.filter(models.Article.author_id == author_id)
+    query = query.order_by(models.Article.id)
+    return stream_export(query, [column.key for column in columns], format, "articles")
+
+
 @router.get("/{article_id}", response_model=schemas.ArticleDetail)
 def get_article(
     article_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """获取指定文章详情"""
-    article = db.query(models.Article).filter(models.Article.id == article_id).first()
-    if not article:
-        raise HTTPException(status_code=404, detail="文章不存在")
-    return article
+    """获取指定文章详情（支持ETag条件请求）"""
+    cache_key = f"article:{article_id}"
+    entry = response_cache.get(cache_key) if cache_readable(db) else None
+    if entry is None:
+        deps = response_cache.versions(cache_key)
+        article = db.query(models.Article).options(
+            joinedload(models.Article.author, innerjoin=True)
+        ).filter(models.Article.id == article_id).first()
+        if not article:
+            raise HTTPException(status_code=404, detail="文章不存在")
+        deps.update(response_cache.versions(f"user:{article.author_id}"))
+        entry = response_cache.put(
+            cache_key, serialize(schemas.ArticleDetail, article), deps, article.updated_at,
+            ttl=read_cache_ttl(db), version=article.version, store=cache_writable(db, deps),
+        )
+    return response_cache.respond(request, entry)
 
 
 @router.put("/{article_id}", response_model=schemas.ArticleResponse)
 def update_article(
     article_id: int,
     article_update: schemas.ArticleUpdate,
+    request: Request,
+    response: Response,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """更新文章"""
-    db_article = db.query(models.Article).filter(
-        models.Article.id == article_id,
-        models.Article.author_id == current_user.id
-    ).first()
-    
-    if not db_article:
-        raise HTTPException(
-            status_code=404, 
-            detail="文章不存在或您无权修改此文章"
-        )
-    
-    # 更新文章信息
-    for key, value in article_update.dict(exclude_unset=True).items():
-        setattr(db_article, key, value)
-    
+    """更新文章（携带If-Match时版本号不一致返回412）"""
+    owned = (models.Article.id == article_id, models.Article.author_id == current_user.id)
+    result = db.execute(versioned_update(
+        models.Article, owned, article_update.dict(exclude_unset=True), if_match_versions(request)
+    ))
+    if result.rowcount == 0:
+        # 仅在更新失败时区分文章不存在和版本冲突
+        if db.query(models.Article.id).filter(*owned).first() is None:
+            raise HTTPException(
+                status_code=404, 
+                detail="文章不存在或您无权修改此文章"
+            )
+        raise precondition_failed()
     db.commit()
-    db.refresh(db_article)
+    cache_key = f"article:{article_id}"
+    response_cache.bump(cache_key)
+    
+    db_article = db.query(models.Article).filter(models.Article.id == article_id).first()
+    # 与详情接口按相同的依赖计算ETag，客户端可直接用于随后GET的If-None-Match
+    deps = response_cache.versions(cache_key, f"user:{db_article.author_id}")
+    response.headers["ETag"] = response_cache.etag(cache_key, deps, db_article.updated_at, db_article.version)
     return db_article
 
 
@@ -112,28 +243,58 @@ def delete_article(
         )
     
     db.delete(article)
+    _adjust_article_count(db, current_user.id, -1)
     db.commit()
+    response_cache.bump(f"article:{article_id}", "author_stats")
     return None
 
 
+def _adjust_article_count(db: Session, author_id: int, delta: int):
+    """在同一事务中原子地增减作者的文章数计数器"""
+    db.query(models.User).filter(models.User.id == author_id).update(
+        {
+            models.User.article_count: models.User.article_count + delta,
+            # 保持updated_at不变，文章数变化不算作用户资料更新
+            models.User.updated_at: models.User.updated_at,
+        },
+        synchronize_session=False,
+    )
+
+
 @router.get("/author/stats", response_model=List[schemas.AuthorStats])
 def get_author_stats(
-    db: Session = Depends(get_db),
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=PAGE_SIZE_MAX),
+    sort_by: str = Query("article_count", regex="^(article_count|author_id)$", description="排序字段"),
+    order: str = Query("desc", regex="^(asc|desc)$", description="排序方向"),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """获取作者统计数据"""
+    """获取作者统计数据（读取文章数计数器，按索引排序分页，支持ETag条件请求）"""
+    cache_key = f"author_stats:{skip}:{limit}:{sort_by}:{order}"
+    entry = response_cache.get(cache_key) if cache_readable(db) else None
+    if entry is not None:
+        return response_cache.respond(request, entry)
+    deps = response_cache.versions("author_stats")
+
+    if sort_by == "article_count":
+        sort_columns = [models.User.article_count, models.User.id]
+    else:
+        sort_columns = [models.User.id]
+    if order == "desc":
+        sort_columns = [column.desc() for column in sort_columns]
+
     stats = db.query(
         models.User.id.label('author_id'),
         models.User.username,
         models.User.email,
         models.User.avatar_url,
-        func.count(models.Article.id).label('article_count')
-    ).join(
-        models.Article, 
-        models.User.id == models.Article.author_id, 
-        isouter=True
-    ).group_by(
-        models.User.id
-    ).all()
+        models.User.article_count
+    ).order_by(
+        *sort_columns
+    ).offset(skip).limit(limit).all()
     
-    return stats
\ No newline at end of file
+    entry = response_cache.put(cache_key, dumps([row._asdict() for row in stats]), deps, ttl=read_cache_ttl(db),
+                               store=cache_writable(db, deps))
+    return response_cache.respond(request, entry)
\ No newline at end of file
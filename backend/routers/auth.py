@@ -1,12 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import timedelta
 import models
 import schemas
-from database import get_db
-from auth import authenticate_user, create_access_token, get_password_hash, ACCESS_TOKEN_EXPIRE_MINUTES
-from typing import List
+from database import get_db, get_async_db
+from auth import (
+    authenticate_user, create_access_token, get_password_hash, verify_password, invalidate_user_cache,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+)
+from response_cache import response_cache
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashing
+import hmac
+import os
+import re
 
 router = APIRouter(
     prefix="/auth",
@@ -14,24 +27,29 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# 批量开通账号的令牌，未配置时禁用该接口
+PROVISIONING_TOKEN = os.getenv("PROVISIONING_TOKEN")
+# 单次批量开通的最大用户数
+PROVISION_MAX = int(os.getenv("PROVISION_MAX", 5000))
+PROVISION_INSERT_BATCH_SIZE = 500
+# 所有批量开通请求合计同时计算密码哈希的任务数，默认不超过哈希进程池排队上限的一半
+PROVISION_HASH_CONCURRENCY = max(1, hashing.HASH_POOL_MAX_PENDING // 2)
+
+_provision_semaphore = None
+
+
+def _get_provision_semaphore() -> asyncio.Semaphore:
+    """所有批量开通请求共用的信号量（在事件循环中首次使用时创建）"""
+    global _provision_semaphore
+    if _provision_semaphore is None:
+        _provision_semaphore = asyncio.Semaphore(PROVISION_HASH_CONCURRENCY)
+    return _provision_semaphore
+
 
 @router.post("/register", response_model=schemas.UserResponse)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    """用户注册"""
-    # 检查用户名是否已存在
-    db_user_by_username = db.query(models.User).filter(
-        models.User.username == user.username).first()
-    if db_user_by_username:
-        raise HTTPException(status_code=400, detail="用户名已存在")
-
-    # 检查邮箱是否已存在
-    db_user_by_email = db.query(models.User).filter(
-        models.User.email == user.email).first()
-    if db_user_by_email:
-        raise HTTPException(status_code=400, detail="邮箱已存在")
-
-    # 创建新用户
-    hashed_password = get_password_hash(user.password)
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    """用户注册（依赖用户名和邮箱的唯一约束判断重复，不预先查询）"""
+    hashed_password = await get_password_hash(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -40,15 +58,42 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         balance=0.0
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=_duplicate_detail(e))
+    # 作者统计包含没有文章的用户，新用户需要出现在统计中
+    response_cache.bump("author_stats")
+    await db.refresh(db_user)
     return db_user
 
 
+# 唯一约束名与错误信息：MySQL报告索引名（8.0起带表名前缀），SQLite报告"表名.列名"
+_DUPLICATE_DETAILS = {
+    "ix_users_username": "用户名已存在",
+    "users.ix_users_username": "用户名已存在",
+    "users.username": "用户名已存在",
+    "ix_users_email": "邮箱已存在",
+    "users.ix_users_email": "邮箱已存在",
+    "users.email": "邮箱已存在",
+}
+_MYSQL_DUPLICATE_KEY = re.compile(r"for key '([^']+)'")
+_SQLITE_UNIQUE_FAILED = re.compile(r"UNIQUE constraint failed: ([\w.]+)")
+
+
+def _duplicate_detail(error: IntegrityError) -> str:
+    """根据违反的唯一约束名生成错误信息（错误消息中还包含重复的值，不能按整条消息匹配）"""
+    message = str(error.orig)
+    match = _MYSQL_DUPLICATE_KEY.search(message) or _SQLITE_UNIQUE_FAILED.search(message)
+    constraint = match.group(1) if match else None
+    return _DUPLICATE_DETAILS.get(constraint, "用户名或邮箱已存在")
+
+
 @router.post("/login", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """用户登录"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -63,15 +108,28 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
 
 
 @router.post("/change-password", status_code=status.HTTP_200_OK)
-def change_password(password_data: schemas.PasswordChange, db: Session = Depends(get_db)):
+async def change_password(password_data: schemas.PasswordChange, db: AsyncSession = Depends(get_async_db)):
     """修改密码"""
-    user = authenticate_user(db, password_data.username, password_data.old_password)
-    if not user:
+    result = await db.execute(
+        select(models.User.hashed_password).where(models.User.username == password_data.username)
+    )
+    old_hash = result.scalar()
+    if old_hash is None or not await verify_password(password_data.old_password, old_hash):
         raise HTTPException(status_code=400, detail="用户名或原密码错误")
 
-    # 更新密码
-    user.hashed_password = get_password_hash(password_data.new_password)
-    db.commit()
+    # 只更新密码列；条件中带上原哈希，期间密码已被其他请求修改时不会覆盖
+    new_hash = await get_password_hash(password_data.new_password)
+    result = await db.execute(
+        update(models.User)
+        .where(models.User.username == password_data.username, models.User.hashed_password == old_hash)
+        .values(hashed_password=new_hash)
+    )
+    if result.rowcount == 0:
+        # 原密码已验证通过，说明计算新哈希期间密码被其他请求修改了
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="密码已被修改，请重新验证原密码后重试")
+    await db.commit()
+    invalidate_user_cache(password_data.username)
     return {"message": "密码修改成功"}
 
 
@@ -90,13 +148,104 @@ def verify_birthday(verification_data: schemas.BirthdayVerification, db: Session
 
 
 @router.post("/reset-password", status_code=status.HTTP_200_OK)
-def reset_password(reset_data: schemas.PasswordReset, db: Session = Depends(get_db)):
+async def reset_password(reset_data: schemas.PasswordReset, db: AsyncSession = Depends(get_async_db)):
     """重置密码"""
-    user = db.query(models.User).filter(models.User.username == reset_data.username).first()
-    if not user:
+    # 只更新密码列，不加载整个用户
+    hashed_password = await get_password_hash(reset_data.new_password)
+    result = await db.execute(
+        update(models.User)
+        .where(models.User.username == reset_data.username)
+        .values(hashed_password=hashed_password)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="用户不存在")
-    
-    # 更新密码
-    user.hashed_password = get_password_hash(reset_data.new_password)
-    db.commit()
-    return {"message": "密码重置成功"}
\ No newline at end of file
+    await db.commit()
+    invalidate_user_cache(reset_data.username)
+    return {"message": "密码重置成功"}
+
+
+@router.post("/provision", response_model=schemas.BulkResult)
+async def provision_users(
+    items: List[Dict[str, Any]] = Body(...),
+    x_provisioning_token: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """批量开通用户账号：在一个事务中使用多行INSERT写入，需要在X-Provisioning-Token请求头中提供开通令牌"""
+    if not PROVISIONING_TOKEN or not x_provisioning_token or not hmac.compare_digest(
+        x_provisioning_token, PROVISIONING_TOKEN
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="无效的开通令牌")
+    if len(items) > PROVISION_MAX:
+        raise HTTPException(status_code=400, detail=f"单次最多开通{PROVISION_MAX}个用户")
+
+    results, valid = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schemas.UserCreate.parse_obj(item)))
+        except ValidationError as e:
+            results.append(schemas.BulkItemResult(index=index, status="invalid", detail=str(e)))
+
+    # 用IN查询批量找出已存在的用户名和邮箱，同一批次内的重复条目只保留第一条
+    taken_usernames = await _existing_values(db, models.User.username, {user.username for _, user in valid})
+    taken_emails = await _existing_values(db, models.User.email, {user.email for _, user in valid})
+
+    accepted = []
+    for index, user in valid:
+        if user.username in taken_usernames:
+            results.append(schemas.BulkItemResult(index=index, status="conflict", detail="用户名已存在"))
+        elif user.email in taken_emails:
+            results.append(schemas.BulkItemResult(index=index, status="conflict", detail="邮箱已存在"))
+        else:
+            taken_usernames.add(user.username)
+            taken_emails.add(user.email)
+            accepted.append((index, user))
+
+    # 并发的开通请求共用一个信号量限制提交到哈希进程池的任务数，排队等待而不是占满队列导致登录等请求被拒绝
+    semaphore = _get_provision_semaphore()
+
+    async def hash_limited(password: str) -> str:
+        async with semaphore:
+            return await get_password_hash(password)
+
+    # 单条哈希失败（如进程池仍然饱和）只影响该条目，不放弃整批
+    hashes = await asyncio.gather(*(hash_limited(user.password) for _, user in accepted), return_exceptions=True)
+    hashed, rows = [], []
+    for (index, user), hashed_password in zip(accepted, hashes):
+        if isinstance(hashed_password, HTTPException):
+            results.append(schemas.BulkItemResult(index=index, status="failed", detail=hashed_password.detail))
+            continue
+        if isinstance(hashed_password, BaseException):
+            raise hashed_password
+        hashed.append((index, user))
+        rows.append({
+            "username": user.username,
+            "email": user.email,
+            "hashed_password": hashed_password,
+            "birthday": user.birthday,
+            "balance": 0.0,
+        })
+    try:
+        for start in range(0, len(rows), PROVISION_INSERT_BATCH_SIZE):
+            await db.execute(insert(models.User).values(rows[start:start + PROVISION_INSERT_BATCH_SIZE]))
+        await db.commit()
+    except IntegrityError as e:
+        # 检查之后有并发注册占用了用户名或邮箱，整批回滚
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"开通失败，{_duplicate_detail(e)}，请重试")
+    if rows:
+        response_cache.bump("author_stats")
+
+    results.extend(schemas.BulkItemResult(index=index, status="created") for index, _ in hashed)
+    results.sort(key=lambda item: item.index)
+    return schemas.BulkResult(succeeded=len(hashed), failed=len(results) - len(hashed), items=results)
+
+
+async def _existing_values(db: AsyncSession, column, values: set) -> set:
+    """分批查询给定值中已存在于数据库的部分"""
+    values = list(values)
+    existing = set()
+    for start in range(0, len(values), PROVISION_INSERT_BATCH_SIZE):
+        result = await db.execute(select(column).where(column.in_(values[start:start + PROVISION_INSERT_BATCH_SIZE])))
+        existing.update(result.scalars())
+    return existing
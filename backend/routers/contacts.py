@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response, Body
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, insert, update, bindparam
+from pydantic import ValidationError
 import models
 import schemas
 from database import get_db
+from replicas import get_read_db
 from auth import get_current_user
-from typing import List, Optional
+from pagination import PAGE_SIZE_MAX, paginate_by_id
+from export import stream_export
+from serialization import CONTACT_FIELDS, rows_response
+from versioning import if_match_versions, precondition_failed, set_etag, versioned_update
+from typing import List, Optional, Dict, Any
+import os
 
 router = APIRouter(
     prefix="/contacts",
@@ -13,24 +20,33 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# 单次批量操作的最大条目数
+CONTACTS_BULK_MAX = int(os.getenv("CONTACTS_BULK_MAX", 5000))
+# 多行INSERT每批的行数，避免超出数据库的参数数量限制
+BULK_INSERT_BATCH_SIZE = 500
+
 
 @router.get("/", response_model=List[schemas.ContactResponse])
 def get_contacts(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(None, description="分页游标（取自上一页响应头X-Next-Cursor），传入时忽略skip"),
     search: Optional[str] = Query(None, description="按姓名搜索"),
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """获取当前用户的联系人列表"""
-    query = db.query(models.Contact).filter(models.Contact.user_id == current_user.id)
+    """获取当前用户的联系人列表（只查询响应需要的列，直接投影为dict并用orjson编码）"""
+    query = db.query(*[getattr(models.Contact, name) for name in CONTACT_FIELDS]).filter(
+        models.Contact.user_id == current_user.id
+    )
     
     # 如果有搜索关键词，按姓名进行模糊搜索
     if search:
         query = query.filter(models.Contact.name.ilike(f"%{search}%"))
     
-    contacts = query.offset(skip).limit(limit).all()
-    return contacts
+    contacts = paginate_by_id(query, models.Contact.id, response, limit, skip=skip, cursor=cursor)
+    return rows_response(contacts, CONTACT_FIELDS, response)
 
 
 @router.post("/", response_model=schemas.ContactResponse, status_code=status.HTTP_201_CREATED)
@@ -47,9 +63,137 @@ def create_contact(
     return db_contact
 
 
+def _validate_bulk_items(items: List[Dict[str, Any]], schema):
+    """逐条校验批量请求，返回校验通过的(序号, 数据)列表和失败条目的结果"""
+    if len(items) > CONTACTS_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"单次最多处理{CONTACTS_BULK_MAX}条记录")
+    valid, results = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.parse_obj(item)))
+        except ValidationError as e:
+            results.append(schemas.BulkItemResult(index=index, status="invalid", detail=str(e)))
+    return valid, results
+
+
+def _owned_contact_ids(db: Session, user_id: int, contact_ids) -> set:
+    """查询给定ID中属于当前用户的联系人"""
+    if not contact_ids:
+        return set()
+    rows = db.query(models.Contact.id).filter(
+        models.Contact.user_id == user_id,
+        models.Contact.id.in_(set(contact_ids))
+    ).all()
+    return {row.id for row in rows}
+
+
+def _bulk_result(results: List[schemas.BulkItemResult], success_status: str) -> schemas.BulkResult:
+    results.sort(key=lambda item: item.index)
+    succeeded = sum(1 for item in results if item.status == success_status)
+    return schemas.BulkResult(succeeded=succeeded, failed=len(results) - succeeded, items=results)
+
+
+@router.post("/bulk", response_model=schemas.BulkResult)
+def bulk_create_contacts(
+    items: List[Dict[str, Any]] = Body(...),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """批量创建联系人：在一个事务中使用多行INSERT写入所有校验通过的条目"""
+    valid, results = _validate_bulk_items(items, schemas.ContactCreate)
+    rows = [dict(contact.dict(), user_id=current_user.id) for _, contact in valid]
+
+    for start in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+        db.execute(insert(models.Contact).values(rows[start:start + BULK_INSERT_BATCH_SIZE]))
+    db.commit()
+
+    results.extend(schemas.BulkItemResult(index=index, status="created") for index, _ in valid)
+    return _bulk_result(results, "created")
+
+
+@router.put("/bulk", response_model=schemas.BulkResult)
+def bulk_update_contacts(
+    items: List[Dict[str, Any]] = Body(...),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """批量更新联系人：相同字段组合的条目合并为一次executemany UPDATE"""
+    valid, results = _validate_bulk_items(items, schemas.ContactBulkUpdate)
+    owned_ids = _owned_contact_ids(db, current_user.id, [contact.id for _, contact in valid])
+
+    groups = {}
+    for index, contact in valid:
+        if contact.id not in owned_ids:
+            results.append(schemas.BulkItemResult(index=index, id=contact.id, status="not_found", detail="联系人不存在"))
+            continue
+        values = contact.dict(exclude_unset=True, exclude={"id"})
+        groups.setdefault(tuple(sorted(values)), []).append(dict(values, contact_id=contact.id))
+        results.append(schemas.BulkItemResult(index=index, id=contact.id, status="updated"))
+
+    for fields, params in groups.items():
+        stmt = update(models.Contact).where(
+            models.Contact.id == bindparam("contact_id"),
+            models.Contact.user_id == current_user.id
+        ).values({field: bindparam(field) for field in fields}).values(version=models.Contact.version + 1)
+        db.execute(stmt, params)
+    db.commit()
+
+    return _bulk_result(results, "updated")
+
+
+@router.delete("/bulk", response_model=schemas.BulkResult)
+def bulk_delete_contacts(
+    payload: schemas.ContactBulkDelete,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """批量删除联系人：一条DELETE ... WHERE id IN (...)删除所有属于当前用户的条目"""
+    if len(payload.ids) > CONTACTS_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"单次最多处理{CONTACTS_BULK_MAX}条记录")
+    owned_ids = _owned_contact_ids(db, current_user.id, payload.ids)
+    if owned_ids:
+        db.query(models.Contact).filter(
+            models.Contact.user_id == current_user.id,
+            models.Contact.id.in_(owned_ids)
+        ).delete(synchronize_session=False)
+        db.commit()
+
+    results = [
+        schemas.BulkItemResult(index=index, id=contact_id, status="deleted")
+        if contact_id in owned_ids else
+        schemas.BulkItemResult(index=index, id=contact_id, status="not_found", detail="联系人不存在")
+        for index, contact_id in enumerate(payload.ids)
+    ]
+    return _bulk_result(results, "deleted")
+
+
+@router.get("/export")
+def export_contacts(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="导出格式"),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """流式导出当前用户的联系人"""
+    columns = [
+        models.Contact.id,
+        models.Contact.name,
+        models.Contact.province,
+        models.Contact.city,
+        models.Contact.address,
+        models.Contact.postal_code,
+        models.Contact.created_at,
+        models.Contact.updated_at,
+    ]
+    query = db.query(*columns).filter(
+        models.Contact.user_id == current_user.id
+    ).order_by(models.Contact.id)
+    return stream_export(query, [column.key for column in columns], format, "contacts")
+
+
 @router.get("/{contact_id}", response_model=schemas.ContactResponse)
 def get_contact(
     contact_id: int,
+    response: Response,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -60,6 +204,7 @@ def get_contact(
     ).first()
     if not contact:
         raise HTTPException(status_code=404, detail="联系人不存在")
+    set_etag(response, contact.version)
     return contact
 
 
@@ -67,23 +212,25 @@ def get_contact(
 def update_contact(
     contact_id: int,
     contact_update: schemas.ContactUpdate,
+    request: Request,
+    response: Response,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """更新联系人"""
-    db_contact = db.query(models.Contact).filter(
-        models.Contact.id == contact_id,
-        models.Contact.user_id == current_user.id
-    ).first()
-    if not db_contact:
-        raise HTTPException(status_code=404, detail="联系人不存在")
-    
-    # 更新联系人信息
-    for key, value in contact_update.dict(exclude_unset=True).items():
-        setattr(db_contact, key, value)
-    
+    """更新联系人（携带If-Match时版本号不一致返回412）"""
+    owned = (models.Contact.id == contact_id, models.Contact.user_id == current_user.id)
+    result = db.execute(versioned_update(
+        models.Contact, owned, contact_update.dict(exclude_unset=True), if_match_versions(request)
+    ))
+    if result.rowcount == 0:
+        # 仅在更新失败时区分联系人不存在和版本冲突
+        if db.query(models.Contact.id).filter(*owned).first() is None:
+            raise HTTPException(status_code=404, detail="联系人不存在")
+        raise precondition_failed()
     db.commit()
-    db.refresh(db_contact)
+    
+    db_contact = db.query(models.Contact).filter(models.Contact.id == contact_id).first()
+    set_etag(response, db_contact.version)
     return db_contact
 
 
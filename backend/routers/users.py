@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, BackgroundTasks, Query, Request, Response
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 import models
 import schemas
-from database import get_db
-from auth import get_current_user
+from database import SessionLocal, get_async_db
+from replicas import cache_readable, cache_writable, get_async_read_db, read_cache_ttl
+from auth import get_current_user, invalidate_user_cache
 from typing import List, Optional
-import os
-import boto3
+from starlette.concurrency import run_in_threadpool
 from botocore.exceptions import NoCredentialsError
-import uuid
-import json
+import avatars
+from response_cache import response_cache, serialize
+from versioning import if_match_versions, precondition_failed, set_etag, versioned_update
+import storage
+import os
 from datetime import date
 import logging
 
@@ -23,30 +27,85 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-# S3客户端配置
-s3_client = boto3.client(
-    's3',
-    endpoint_url=os.getenv("S3_ENDPOINT_URL", "http://minio:9000"),
-    aws_access_key_id=os.getenv("S3_ACCESS_KEY", "minioadmin"),
-    aws_secret_access_key=os.getenv("S3_SECRET_KEY", "minioadmin"),
-    region_name=os.getenv("S3_REGION", "us-east-1")
-)
-BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "avatars")
+# 头像文件大小上限（字节）
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", 5 * 1024 * 1024))
+# 头像上传请求体的上限：文件大小加上multipart分隔符和字段头（需与nginx的client_max_body_size一致）
+AVATAR_MAX_BODY_BYTES = AVATAR_MAX_BYTES + 64 * 1024
+# 批量查询用户时单次最多的ID数
+USERS_BATCH_MAX = int(os.getenv("USERS_BATCH_MAX", 200))
+
+
+@router.get("/", response_model=List[schemas.UserResponse])
+async def get_users_by_ids(
+    ids: str = Query(..., description="用户ID列表（逗号分隔），如1,2,3"),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """批量获取用户信息，不存在的ID会被忽略"""
+    try:
+        user_ids = [int(user_id) for user_id in ids.split(",") if user_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids必须是逗号分隔的整数")
+    return await _users_response(db, user_ids)
+
+
+@router.post("/batch", response_model=List[schemas.UserResponse])
+async def get_users_batch(
+    batch: schemas.UserBatchRequest,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """批量获取用户信息（ID较多时使用请求体），不存在的ID会被忽略"""
+    return await _users_response(db, batch.ids)
+
+
+async def _users_response(db: AsyncSession, user_ids: List[int]) -> Response:
+    """优先读取与用户详情接口共用的响应缓存，未命中的用户用一条IN查询获取，按请求顺序返回"""
+    user_ids = list(dict.fromkeys(user_ids))
+    if len(user_ids) > USERS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"单次最多查询{USERS_BATCH_MAX}个用户")
+
+    bodies = {}
+    missing = {}
+    use_cache = cache_readable(db)
+    for user_id in user_ids:
+        cache_key = f"user:{user_id}"
+        entry = response_cache.get(cache_key) if use_cache else None
+        if entry is not None:
+            bodies[user_id] = entry["body"]
+        else:
+            missing[user_id] = response_cache.versions(cache_key)
+
+    if missing:
+        result = await db.execute(select(models.User).where(models.User.id.in_(list(missing))))
+        for user in result.scalars():
+            entry = response_cache.put(
+                f"user:{user.id}", serialize(schemas.UserResponse, user), missing[user.id], user.updated_at,
+                ttl=read_cache_ttl(db), version=user.version, store=cache_writable(db, missing[user.id]),
+            )
+            bodies[user.id] = entry["body"]
+
+    # 缓存中保存的是序列化后的JSON，直接拼接为数组
+    body = "[" + ",".join(bodies[user_id] for user_id in user_ids if user_id in bodies) + "]"
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/me", response_model=schemas.UserResponse)
-async def get_user_me(current_user: models.User = Depends(get_current_user)):
+async def get_user_me(response: Response, current_user: models.User = Depends(get_current_user)):
     """获取当前登录用户信息"""
+    set_etag(response, current_user.version)
     return current_user
 
 
 @router.put("/me", response_model=schemas.UserResponse)
 async def update_user_me(
     user_update: schemas.UserUpdate,
+    request: Request,
+    response: Response,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """更新当前登录用户信息"""
+    """更新当前登录用户信息（携带If-Match时版本号不一致返回412）"""
     # 记录原始请求数据，方便调试
     logger.info(f"更新用户信息: 用户ID={current_user.id}, 请求数据={user_update.dict()}")
     
@@ -79,82 +138,75 @@ async def update_user_me(
     # 记录要更新的字段
     logger.info(f"即将更新的字段: {update_data.keys()}")
             
-    # 更新用户信息
-    for key, value in update_data.items():
-        setattr(current_user, key, value)
-    
+    # 单条UPDATE更新用户信息并递增版本号
+    stmt = versioned_update(models.User, (models.User.id == current_user.id,), update_data, if_match_versions(request))
     try:
-        db.commit()
-        db.refresh(current_user)
+        result = await db.execute(stmt)
+        if result.rowcount == 0:
+            raise precondition_failed()
+        await db.commit()
+        invalidate_user_cache(current_user.username)
+        response_cache.bump(f"user:{current_user.id}", "author_stats")
+        await db.refresh(current_user)
         logger.info(f"用户信息更新成功: 用户ID={current_user.id}")
+        set_etag(response, current_user.version)
         return current_user
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"更新用户信息失败: {e}")
         raise HTTPException(status_code=500, detail=f"更新用户信息失败: {str(e)}")
 
 
 @router.post("/avatar", response_model=schemas.UserResponse)
 async def upload_avatar(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """上传用户头像"""
     # 检查文件类型
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="只能上传图片文件")
     
-    # 生成唯一文件名
-    file_extension = file.filename.split(".")[-1]
-    new_filename = f"{uuid.uuid4()}.{file_extension}"
+    # 检查文件大小：请求体超过AVATAR_MAX_BODY_BYTES时已由BodySizeLimitMiddleware在暂存之前拒绝，
+    # 这里检查的是文件本身（上传内容已由框架暂存在临时文件中，超过1MB的部分位于磁盘而非内存）
+    file.file.seek(0, os.SEEK_END)
+    file_size = file.file.tell()
+    file.file.seek(0)
+    if file_size > AVATAR_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"头像文件不能超过{AVATAR_MAX_BYTES // (1024 * 1024)}MB"
+        )
     
     try:
-        # 确保存储桶存在，并设置为公开访问
-        try:
-            s3_client.head_bucket(Bucket=BUCKET_NAME)
-        except:
-            # 创建桶
-            s3_client.create_bucket(Bucket=BUCKET_NAME)
-            
-            # 设置桶策略为公开读取
-            bucket_policy = {
-                "Version": "2012-10-17",
-                "Statement": [
-                    {
-                        "Sid": "PublicRead",
-                        "Effect": "Allow",
-                        "Principal": "*",
-                        "Action": ["s3:GetObject"],
-                        "Resource": [f"arn:aws:s3:::{BUCKET_NAME}/*"]
-                    }
-                ]
-            }
-            # 应用桶策略
-            s3_client.put_bucket_policy(
-                Bucket=BUCKET_NAME,
-                Policy=json.dumps(bucket_policy)
-            )
-        
-        # 上传文件到S3
-        file_content = await file.read()
-        s3_client.put_object(
-            Bucket=BUCKET_NAME,
-            Key=new_filename,
-            Body=file_content,
-            ContentType=file.content_type,
-            ACL='public-read'  # 设置对象为公开读取
-        )
-        
-        # 生成正确的URL（直接使用公开访问URL）
-        s3_public_url = os.getenv('S3_PUBLIC_URL', 'http://localhost:9000')
-        avatar_url = f"{s3_public_url}/{BUCKET_NAME}/{new_filename}"
+        # 按内容哈希命名，相同图片只上传一次
+        avatar_hash = await run_in_threadpool(avatars.content_hash, file.file)
+        original_key = avatars.original_key(avatar_hash)
+        if not await run_in_threadpool(storage.object_exists, original_key):
+            # 在线程池中从临时文件流式上传到S3，不阻塞事件循环
+            await run_in_threadpool(storage.upload_fileobj, file.file, original_key, file.content_type)
+        avatar_url = storage.public_url(original_key)
+        # 衍生图都已存在（相同图片上传过）时直接返回其URL，否则生成后再记录avatar_hash，
+        # 在此之前响应中只有原图URL，避免返回指向尚不存在（或生成失败）的衍生图的URL
+        variants_ready = not await run_in_threadpool(avatars.missing_variants, avatar_hash)
         
         # 更新用户头像URL
         current_user.avatar_url = avatar_url
-        db.commit()
-        db.refresh(current_user)
+        current_user.avatar_hash = avatar_hash if variants_ready else None
+        current_user.version = models.User.version + 1
+        await db.commit()
+        invalidate_user_cache(current_user.username)
+        response_cache.bump(f"user:{current_user.id}", "author_stats")
+        await db.refresh(current_user)
         
+        # 响应返回后再生成各尺寸的缩略图
+        if not variants_ready:
+            background_tasks.add_task(_publish_avatar_variants, current_user.id, current_user.username, avatar_hash)
         return current_user
     
     except NoCredentialsError:
@@ -163,14 +215,40 @@ async def upload_avatar(
         raise HTTPException(status_code=500, detail=f"上传头像失败: {str(e)}")
 
 
+def _publish_avatar_variants(user_id: int, username: str, avatar_hash: str):
+    """生成衍生图，全部上传成功且用户头像未再更换时才记录avatar_hash（在后台任务中执行）"""
+    if not avatars.generate_variants(avatar_hash):
+        return
+    with SessionLocal() as db:
+        result = db.execute(
+            update(models.User)
+            .where(models.User.id == user_id,
+                   models.User.avatar_url == storage.public_url(avatars.original_key(avatar_hash)))
+            .values(avatar_hash=avatar_hash, version=models.User.version + 1)
+        )
+        db.commit()
+    if result.rowcount:
+        invalidate_user_cache(username)
+        response_cache.bump(f"user:{user_id}", "author_stats")
+
+
 @router.get("/{user_id}", response_model=schemas.UserResponse)
 async def get_user_by_id(
     user_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """获取指定用户的信息"""
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="用户不存在")
-    return user
\ No newline at end of file
+    """获取指定用户的信息（支持ETag条件请求）"""
+    cache_key = f"user:{user_id}"
+    entry = response_cache.get(cache_key) if cache_readable(db) else None
+    if entry is None:
+        deps = response_cache.versions(cache_key)
+        result = await db.execute(select(models.User).where(models.User.id == user_id))
+        user = result.scalars().first()
+        if not user:
+            raise HTTPException(status_code=404, detail="用户不存在")
+        entry = response_cache.put(cache_key, serialize(schemas.UserResponse, user), deps, user.updated_at,
+                                     ttl=read_cache_ttl(db), version=user.version,
+                                     store=cache_writable(db, deps))
+    return response_cache.respond(request, entry)
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional, List
+from typing import Optional, List, Dict
 import datetime
 from datetime import date
 
@@ -26,10 +26,23 @@ class UserResponse(UserBase):
     id: int
     birthday: Optional[date]
     avatar_url: Optional[str]
+    avatar_hash: Optional[str] = None
+    avatar_variants: Optional[Dict[str, str]] = None
     balance: float
+    version: int = 1
     created_at: datetime.datetime
     updated_at: datetime.datetime
 
+    @validator("avatar_variants", always=True)
+    def build_avatar_variants(cls, v, values):
+        """根据头像哈希生成各尺寸缩略图的URL"""
+        avatar_hash = values.get("avatar_hash")
+        if not avatar_hash:
+            return None
+        # 延迟导入：avatars依赖存储层（导入时创建S3客户端），Schema模块本身不依赖存储
+        import avatars
+        return avatars.variant_urls(avatar_hash)
+
     class Config:
         orm_mode = True
 
@@ -51,6 +64,7 @@ class ArticleUpdate(ArticleBase):
 class ArticleResponse(ArticleBase):
     id: int
     author_id: int
+    version: int = 1
     created_at: datetime.datetime
     updated_at: datetime.datetime
 
@@ -65,6 +79,13 @@ class ArticleDetail(ArticleResponse):
         orm_mode = True
 
 
+class ArticleListItem(ArticleResponse):
+    author: Optional[UserResponse] = None
+
+    class Config:
+        orm_mode = True
+
+
 # 联系人相关Schema
 class ContactBase(BaseModel):
     name: str
@@ -85,6 +106,7 @@ class ContactUpdate(ContactBase):
 class ContactResponse(ContactBase):
     id: int
     user_id: int
+    version: int = 1
     created_at: datetime.datetime
     updated_at: datetime.datetime
 
@@ -92,6 +114,28 @@ class ContactResponse(ContactBase):
         orm_mode = True
 
 
+class ContactBulkUpdate(ContactUpdate):
+    id: int
+
+
+class ContactBulkDelete(BaseModel):
+    ids: List[int]
+
+
+# 批量操作结果Schema
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    status: str
+    detail: Optional[str] = None
+
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    items: List[BulkItemResult]
+
+
 # 认证相关Schema
 class Token(BaseModel):
     access_token: str
@@ -118,6 +162,10 @@ class PasswordReset(BaseModel):
     new_password: str
 
 
+class UserBatchRequest(BaseModel):
+    ids: List[int]
+
+
 # 统计相关Schema
 class AuthorStats(BaseModel):
     author_id: int
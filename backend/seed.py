@@ -0,0 +1,194 @@
+"""生成模拟数据（用于基准测试和容量评估）
+
+用法:
+    python seed.py --users 100000 --articles 5000000 --contacts 10000000
+    python seed.py --users 1000 --articles 20000 --contacts 50000 --password bench --seed 1
+
+执行前会先应用未执行的迁移。用户名为"<前缀><ID>"，所有用户使用同一个密码（bcrypt哈希只计算一次）。
+数据按批写入，每批一个事务（PyMySQL的executemany会把INSERT合并为多行VALUES），文章和联系人随机分配给
+本次生成的用户，文章写完后按作者索引回填文章数计数器。
+"""
+import argparse
+import datetime
+import logging
+import random
+import time
+from sqlalchemy import func, select, text, update
+from database import engine
+from hashing import pwd_context
+import migrate
+import models
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 文章标题和正文使用的词表（基准测试的搜索场景也从中取词）
+WORDS = [
+    "数据库", "索引", "缓存", "性能", "查询", "连接池", "事务", "分页", "接口", "服务",
+    "部署", "监控", "日志", "容器", "并发", "异步", "优化", "架构", "测试", "文章",
+    "python", "fastapi", "mysql", "redis", "docker", "latency", "throughput", "benchmark",
+]
+PROVINCES = {
+    "北京市": ["北京市"],
+    "上海市": ["上海市"],
+    "广东省": ["广州市", "深圳市", "珠海市", "佛山市"],
+    "浙江省": ["杭州市", "宁波市", "温州市"],
+    "江苏省": ["南京市", "苏州市", "无锡市"],
+    "四川省": ["成都市", "绵阳市"],
+}
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗"
+GIVEN_NAMES = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂"
+
+# 生成数据的创建时间分布在最近一年内
+_TIME_SPAN_SECONDS = 365 * 24 * 3600
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _timestamp(rng: random.Random, now: datetime.datetime) -> datetime.datetime:
+    return now - datetime.timedelta(seconds=rng.randrange(_TIME_SPAN_SECONDS))
+
+
+def _user_rows(first_id: int, count: int, prefix: str, hashed_password: str, rng: random.Random, now):
+    for user_id in range(first_id, first_id + count):
+        created_at = _timestamp(rng, now)
+        yield {
+            "id": user_id,
+            "username": f"{prefix}{user_id}",
+            "email": f"{prefix}{user_id}@example.com",
+            "hashed_password": hashed_password,
+            "birthday": datetime.date(1960, 1, 1) + datetime.timedelta(days=rng.randrange(45 * 365)),
+            "balance": round(rng.uniform(0, 10000), 2),
+            "article_count": 0,
+            "version": 1,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+
+def _article_rows(first_user_id: int, users: int, count: int, content_words: int, rng: random.Random, now):
+    for _ in range(count):
+        created_at = _timestamp(rng, now)
+        yield {
+            "title": _sentence(rng, rng.randint(3, 8)),
+            "content": _sentence(rng, content_words),
+            "author_id": first_user_id + rng.randrange(users),
+            "version": 1,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+
+def _contact_rows(first_user_id: int, users: int, count: int, rng: random.Random, now):
+    provinces = list(PROVINCES)
+    for _ in range(count):
+        province = rng.choice(provinces)
+        created_at = _timestamp(rng, now)
+        yield {
+            "user_id": first_user_id + rng.randrange(users),
+            "name": rng.choice(SURNAMES) + "".join(rng.choice(GIVEN_NAMES) for _ in range(rng.randint(1, 2))),
+            "province": province,
+            "city": rng.choice(PROVINCES[province]),
+            "address": f"{rng.choice(WORDS)}路{rng.randint(1, 999)}号",
+            "postal_code": f"{rng.randint(100000, 999999)}",
+            "version": 1,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+
+def _insert_batches(conn, table, rows, total: int, batch_size: int):
+    """按批写入，每批一个事务，并定期输出进度"""
+    if total <= 0:
+        return
+    started = time.perf_counter()
+    written = 0
+    batch = []
+    last_report = started
+    for row in rows:
+        batch.append(row)
+        if len(batch) < batch_size:
+            continue
+        with conn.begin():
+            conn.execute(table.insert(), batch)
+        written += len(batch)
+        batch = []
+        if time.perf_counter() - last_report >= 5:
+            last_report = time.perf_counter()
+            logger.info(f"{table.name}: {written}/{total} ({written / (last_report - started):.0f} 行/秒)")
+    if batch:
+        with conn.begin():
+            conn.execute(table.insert(), batch)
+        written += len(batch)
+    elapsed = time.perf_counter() - started
+    logger.info(f"{table.name}: 写入{written}行，耗时{elapsed:.1f}秒 ({written / max(elapsed, 1e-9):.0f} 行/秒)")
+
+
+def _backfill_article_counts(conn, first_user_id: int, users: int, batch_size: int):
+    """按用户ID范围分批回填文章数计数器（子查询走articles的(author_id, id)索引）"""
+    article_count = select(func.count()).where(
+        models.Article.author_id == models.User.id
+    ).scalar_subquery()
+    for start in range(first_user_id, first_user_id + users, batch_size):
+        end = min(start + batch_size, first_user_id + users) - 1
+        with conn.begin():
+            conn.execute(
+                update(models.User).where(models.User.id.between(start, end)).values(article_count=article_count)
+            )
+
+
+def seed(users: int, articles: int, contacts: int, password: str, prefix: str = "seed_",
+         content_words: int = 200, batch_size: int = 5000, random_seed: int = None):
+    """生成模拟数据，返回本次生成的用户ID范围(first_id, last_id)"""
+    if users <= 0 and (articles > 0 or contacts > 0):
+        raise ValueError("生成文章或联系人时至少需要生成一个用户")
+    rng = random.Random(random_seed)
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    # 所有模拟用户共用一个哈希，避免逐个计算bcrypt
+    hashed_password = pwd_context.hash(password)
+
+    with engine.connect() as conn:
+        if conn.dialect.name == "mysql":
+            # 外键值由本脚本生成，写入期间跳过外键检查
+            conn.execute(text("SET SESSION foreign_key_checks = 0"))
+        elif conn.dialect.name == "sqlite":
+            conn.execute(text("PRAGMA synchronous = OFF"))
+
+        first_id = (conn.execute(select(func.max(models.User.id))).scalar() or 0) + 1
+        logger.info(f"生成用户ID {first_id} - {first_id + users - 1}")
+
+        _insert_batches(conn, models.User.__table__,
+                        _user_rows(first_id, users, prefix, hashed_password, rng, now), users, batch_size)
+        _insert_batches(conn, models.Article.__table__,
+                        _article_rows(first_id, users, articles, content_words, rng, now), articles, batch_size)
+        _insert_batches(conn, models.Contact.__table__,
+                        _contact_rows(first_id, users, contacts, rng, now), contacts, batch_size)
+        if articles > 0:
+            _backfill_article_counts(conn, first_id, users, batch_size)
+            logger.info("已回填作者文章数")
+
+    return first_id, first_id + users - 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成模拟数据")
+    parser.add_argument("--users", type=int, default=1000, help="用户数")
+    parser.add_argument("--articles", type=int, default=10000, help="文章数")
+    parser.add_argument("--contacts", type=int, default=20000, help="联系人数")
+    parser.add_argument("--password", default="password", help="所有模拟用户的密码")
+    parser.add_argument("--prefix", default="seed_", help="用户名前缀")
+    parser.add_argument("--content-words", type=int, default=200, help="每篇文章正文的词数")
+    parser.add_argument("--batch-size", type=int, default=5000, help="每批写入的行数")
+    parser.add_argument("--seed", type=int, default=None, help="随机数种子（相同种子生成相同数据）")
+    args = parser.parse_args()
+
+    # 批量写入的每批语句都会超过慢查询阈值，生成数据时不输出慢查询日志
+    logging.getLogger("instrumentation").setLevel(logging.ERROR)
+    migrate.wait_for_database()
+    migrate.migrate()
+    started = time.perf_counter()
+    seed(args.users, args.articles, args.contacts, args.password, args.prefix,
+         args.content_words, args.batch_size, args.seed)
+    logger.info(f"模拟数据生成完成，总耗时{time.perf_counter() - started:.1f}秒")
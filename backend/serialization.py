@@ -0,0 +1,45 @@
+from typing import Iterable, List
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+import avatars
+import schemas
+
+# 列表接口的快速序列化：数据库读出的数据字段类型可信，按响应Schema的字段直接投影为dict后用orjson编码，
+# 跳过逐行构造Pydantic模型和jsonable_encoder。新增Schema字段时投影自动跟随（字段名需与模型属性一致）。
+
+_USER_FIELDS = [name for name in schemas.UserResponse.__fields__ if name != "avatar_variants"]
+ARTICLE_FIELDS = list(schemas.ArticleResponse.__fields__)
+CONTACT_FIELDS = list(schemas.ContactResponse.__fields__)
+
+# 响应头中需要保留到快速响应上的字段（由依赖注入的Response设置，如分页游标）
+_SKIPPED_HEADERS = ("content-length", "content-type")
+
+
+def project(obj, fields: Iterable[str]) -> dict:
+    """按字段名从ORM对象或查询结果行中取值"""
+    return {name: getattr(obj, name) for name in fields}
+
+
+def user_dict(user) -> dict:
+    data = project(user, _USER_FIELDS)
+    data["avatar_variants"] = avatars.variant_urls(user.avatar_hash) if user.avatar_hash else None
+    return data
+
+
+def dumps(content) -> str:
+    """用orjson编码为字符串（用于写入响应缓存）"""
+    return orjson.dumps(content).decode()
+
+
+def json_response(content, response: Response = None) -> ORJSONResponse:
+    """用orjson编码响应，并带上依赖注入的Response上已设置的响应头"""
+    headers = None
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key not in _SKIPPED_HEADERS}
+    return ORJSONResponse(content, headers=headers)
+
+
+def rows_response(rows: List, fields: Iterable[str], response: Response = None) -> ORJSONResponse:
+    fields = list(fields)
+    return json_response([project(row, fields) for row in rows], response)
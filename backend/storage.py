@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+import threading
+import time
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# S3客户端配置（boto3客户端是线程安全的，可在线程池中共享）
+s3_client = boto3.client(
+    's3',
+    endpoint_url=os.getenv("S3_ENDPOINT_URL", "http://minio:9000"),
+    aws_access_key_id=os.getenv("S3_ACCESS_KEY", "minioadmin"),
+    aws_secret_access_key=os.getenv("S3_SECRET_KEY", "minioadmin"),
+    region_name=os.getenv("S3_REGION", "us-east-1")
+)
+BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "avatars")
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL", "http://localhost:9000")
+
+# 分片上传配置：超过阈值的文件按分片流式上传，不会整体读入内存
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4,
+)
+
+_bucket_ready = False
+_bucket_lock = threading.Lock()
+
+
+def ensure_bucket():
+    """确保存储桶存在并公开可读，成功后缓存结果，之后不再检查"""
+    global _bucket_ready
+    if _bucket_ready:
+        return
+    with _bucket_lock:
+        if _bucket_ready:
+            return
+        try:
+            s3_client.head_bucket(Bucket=BUCKET_NAME)
+        except ClientError:
+            # 创建桶
+            s3_client.create_bucket(Bucket=BUCKET_NAME)
+
+            # 设置桶策略为公开读取
+            bucket_policy = {
+                "Version": "2012-10-17",
+                "Statement": [
+                    {
+                        "Sid": "PublicRead",
+                        "Effect": "Allow",
+                        "Principal": "*",
+                        "Action": ["s3:GetObject"],
+                        "Resource": [f"arn:aws:s3:::{BUCKET_NAME}/*"]
+                    }
+                ]
+            }
+            # 应用桶策略
+            s3_client.put_bucket_policy(
+                Bucket=BUCKET_NAME,
+                Policy=json.dumps(bucket_policy)
+            )
+            logger.info(f"已创建存储桶: {BUCKET_NAME}")
+        _bucket_ready = True
+
+
+def warm_up():
+    """启动时预先检查存储桶，失败只记录日志，首次上传时会重试"""
+    try:
+        ensure_bucket()
+        logger.info("头像存储桶已就绪")
+    except Exception as e:
+        logger.warning(f"检查头像存储桶失败: {str(e)}")
+
+
+# 上传耗时指标中按原值记录的Content-Type
+_METRIC_CONTENT_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+
+
+def upload_fileobj(fileobj, key: str, content_type: str):
+    """从文件对象流式上传到S3（阻塞调用，应在线程池中执行）"""
+    ensure_bucket()
+    start_time = time.perf_counter()
+    s3_client.upload_fileobj(
+        fileobj,
+        BUCKET_NAME,
+        key,
+        ExtraArgs={
+            "ContentType": content_type,
+            "ACL": "public-read",  # 设置对象为公开读取
+        },
+        Config=TRANSFER_CONFIG,
+    )
+    metrics.s3_upload_duration_seconds.observe(time.perf_counter() - start_time, content_type=_metric_content_type(content_type))
+
+
+def _metric_content_type(content_type: str) -> str:
+    """Content-Type由客户端提供，指标标签只保留常见图片类型，其余归为other，避免标签数量无限增长"""
+    return content_type if content_type in _METRIC_CONTENT_TYPES else "other"
+
+
+def object_exists(key: str) -> bool:
+    """检查对象是否已存在"""
+    try:
+        s3_client.head_object(Bucket=BUCKET_NAME, Key=key)
+        return True
+    except ClientError:
+        return False
+
+
+def download_fileobj(key: str, fileobj):
+    """下载对象到文件对象（阻塞调用）"""
+    s3_client.download_fileobj(BUCKET_NAME, key, fileobj, Config=TRANSFER_CONFIG)
+
+
+def public_url(key: str) -> str:
+    """生成对象的公开访问URL"""
+    return f"{S3_PUBLIC_URL}/{BUCKET_NAME}/{key}"
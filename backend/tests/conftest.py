@@ -0,0 +1,56 @@
+import os
+import tempfile
+
+# 默认使用临时SQLite数据库，设置TEST_DATABASE_URL时使用指定的空数据库（如MySQL，运行依赖FULLTEXT索引的测试）。
+# 需在导入应用模块之前设置（数据库等配置在导入时读取）
+_DB_DIR = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{_DB_DIR}/test.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ["RESPONSE_CACHE_BACKEND"] = "memory"
+os.environ.setdefault("S3_ENDPOINT_URL", "http://127.0.0.1:1")
+os.environ["PROVISIONING_TOKEN"] = "test-provisioning-token"
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+import migrate
+
+PASSWORD = "test-password"
+
+
+@pytest.fixture(scope="session")
+def client():
+    migrate.migrate()
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def _register(client, username: str) -> dict:
+    response = client.post("/api/v1/auth/register", json={
+        "username": username, "email": f"{username}@example.com", "password": PASSWORD,
+    })
+    assert response.status_code == 200, response.text
+    user = response.json()
+    token = client.post("/api/v1/auth/login", data={"username": username, "password": PASSWORD}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    # 预先加载用户缓存，后续请求的认证不再查询数据库
+    assert client.get("/api/v1/users/me", headers=headers).status_code == 200
+    return {"id": user["id"], "headers": headers}
+
+
+@pytest.fixture(scope="session")
+def authors(client):
+    """三个作者，每人5篇文章和5个联系人"""
+    users = [_register(client, f"author{index}") for index in range(3)]
+    for user in users:
+        for index in range(5):
+            response = client.post("/api/v1/articles/", headers=user["headers"], json={
+                "title": f"文章{index}", "content": "数据库 索引 缓存",
+            })
+            assert response.status_code == 201, response.text
+        response = client.post("/api/v1/contacts/bulk", headers=user["headers"], json=[
+            {"name": f"联系人{index}", "city": "深圳市"} for index in range(5)
+        ])
+        assert response.status_code == 200, response.text
+    return users
@@ -0,0 +1,54 @@
+"""认证接口：批量开通和修改密码"""
+from fastapi import HTTPException
+from sqlalchemy import update
+import database
+import models
+from routers import auth as auth_router
+from conftest import PASSWORD
+
+PROVISION_HEADERS = {"X-Provisioning-Token": "test-provisioning-token"}
+
+
+def test_provision_reports_hash_failures_per_item(client, monkeypatch):
+    original = auth_router.get_password_hash
+
+    async def busy_for_one(password):
+        if password == "busy-password":
+            raise HTTPException(status_code=503, detail="服务繁忙，请稍后重试")
+        return await original(password)
+
+    monkeypatch.setattr(auth_router, "get_password_hash", busy_for_one)
+    response = client.post("/api/v1/auth/provision", headers=PROVISION_HEADERS, json=[
+        {"username": "provisioned0", "email": "provisioned0@example.com", "password": PASSWORD},
+        {"username": "provisioned1", "email": "provisioned1@example.com", "password": "busy-password"},
+    ])
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (1, 1)
+    assert [item["status"] for item in body["items"]] == ["created", "failed"]
+
+
+def test_change_password_rejects_wrong_old_password(client, authors):
+    response = client.post("/api/v1/auth/change-password", json={
+        "username": "author0", "old_password": "wrong-password", "new_password": "new-password",
+    })
+    assert response.status_code == 400
+
+
+def test_change_password_conflicts_when_changed_concurrently(client, monkeypatch):
+    client.post("/api/v1/auth/register", json={
+        "username": "racer", "email": "racer@example.com", "password": PASSWORD,
+    })
+    original = auth_router.get_password_hash
+
+    async def changed_meanwhile(password):
+        # 计算新哈希期间另一个请求修改了密码
+        with database.engine.begin() as conn:
+            conn.execute(update(models.User).where(models.User.username == "racer").values(hashed_password="other"))
+        return await original(password)
+
+    monkeypatch.setattr(auth_router, "get_password_hash", changed_meanwhile)
+    response = client.post("/api/v1/auth/change-password", json={
+        "username": "racer", "old_password": PASSWORD, "new_password": "new-password",
+    })
+    assert response.status_code == 409
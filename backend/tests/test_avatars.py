@@ -0,0 +1,40 @@
+"""头像衍生图：生成成功后才在响应中返回衍生图URL"""
+from sqlalchemy import update
+import avatars
+import database
+from auth import invalidate_user_cache
+from response_cache import response_cache
+import models
+import storage
+from routers import users
+
+AVATAR_HASH = "a" * 64
+
+
+def _set_avatar(user_id: int):
+    """模拟上传接口：记录原图URL，衍生图尚未生成"""
+    with database.engine.begin() as conn:
+        conn.execute(update(models.User).where(models.User.id == user_id).values(
+            avatar_url=storage.public_url(avatars.original_key(AVATAR_HASH)), avatar_hash=None,
+        ))
+    invalidate_user_cache("author2")
+    response_cache.bump(f"user:{user_id}")
+
+
+def test_variants_not_advertised_when_generation_fails(client, authors, monkeypatch):
+    user = authors[2]
+    _set_avatar(user["id"])
+    monkeypatch.setattr(avatars, "generate_variants", lambda avatar_hash: False)
+    users._publish_avatar_variants(user["id"], "author2", AVATAR_HASH)
+    body = client.get("/api/v1/users/me", headers=user["headers"]).json()
+    assert body["avatar_variants"] is None
+    assert body["avatar_url"].endswith(avatars.original_key(AVATAR_HASH))
+
+
+def test_variants_advertised_after_generation(client, authors, monkeypatch):
+    user = authors[2]
+    _set_avatar(user["id"])
+    monkeypatch.setattr(avatars, "generate_variants", lambda avatar_hash: True)
+    users._publish_avatar_variants(user["id"], "author2", AVATAR_HASH)
+    body = client.get(f"/api/v1/users/{user['id']}", headers=authors[0]["headers"]).json()
+    assert body["avatar_variants"] == avatars.variant_urls(AVATAR_HASH)
@@ -0,0 +1,21 @@
+"""写接口返回的ETag与随后GET返回的ETag一致"""
+
+
+def test_article_put_etag_matches_following_get(client, authors):
+    headers = authors[1]["headers"]
+    article_id = client.post("/api/v1/articles/", headers=headers, json={"title": "ETag", "content": "正文"}).json()["id"]
+    etag = client.get(f"/api/v1/articles/{article_id}", headers=headers).headers["etag"]
+
+    response = client.put(f"/api/v1/articles/{article_id}", headers={**headers, "If-Match": etag},
+                          json={"title": "ETag 2"})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = client.get(f"/api/v1/articles/{article_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    response = client.put(f"/api/v1/articles/{article_id}", headers={**headers, "If-Match": etag},
+                          json={"title": "ETag 3"})
+    assert response.status_code == 200
+    # 其他测试按作者的文章数断言，删除本测试创建的文章
+    assert client.delete(f"/api/v1/articles/{article_id}", headers=headers).status_code == 204
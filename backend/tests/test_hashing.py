@@ -0,0 +1,18 @@
+"""密码哈希进程池"""
+import asyncio
+import os
+import signal
+import hashing
+
+
+def test_hashing_recovers_after_worker_dies():
+    async def scenario():
+        hashed = await hashing.hash_password("secret")
+        broken = hashing._get_executor()
+        for process in list(broken._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+        # 工作进程被杀后重建进程池，而不是每个请求都失败
+        assert await hashing.verify_password("secret", hashed)
+        assert hashing._get_executor() is not broken
+
+    asyncio.run(scenario())
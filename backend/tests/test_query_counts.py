@@ -0,0 +1,88 @@
+"""接口执行的SQL语句数，防止N+1查询回归"""
+from query_counter import assert_max_queries
+from response_cache import response_cache
+
+
+def test_article_list_runs_one_query(client, authors):
+    with assert_max_queries(1):
+        response = client.get("/api/v1/articles/", headers=authors[0]["headers"], params={"limit": 20})
+    assert response.status_code == 200
+    assert len(response.json()) == 15
+
+
+def test_article_list_with_authors_loads_authors_in_one_query(client, authors):
+    with assert_max_queries(2):
+        response = client.get("/api/v1/articles/", headers=authors[0]["headers"],
+                              params={"limit": 20, "include_author": "true"})
+    assert response.status_code == 200
+    articles = response.json()
+    assert {article["author"]["id"] for article in articles} == {author["id"] for author in authors}
+
+
+def test_article_list_cursor_page_runs_one_query(client, authors):
+    headers = authors[0]["headers"]
+    first = client.get("/api/v1/articles/", headers=headers, params={"limit": 5})
+    with assert_max_queries(1):
+        response = client.get("/api/v1/articles/", headers=headers,
+                              params={"limit": 5, "cursor": first.headers["X-Next-Cursor"]})
+    assert [article["id"] for article in response.json()][0] > first.json()[-1]["id"]
+
+
+def test_article_detail_loads_author_with_join(client, authors):
+    headers = authors[0]["headers"]
+    article_id = client.get("/api/v1/articles/", headers=headers, params={"limit": 1}).json()[0]["id"]
+    response_cache.bump(f"article:{article_id}")
+    with assert_max_queries(1):
+        response = client.get(f"/api/v1/articles/{article_id}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["author"]["id"] == authors[0]["id"]
+
+    # 命中响应缓存时不访问数据库
+    with assert_max_queries(0):
+        assert client.get(f"/api/v1/articles/{article_id}", headers=headers).status_code == 200
+
+
+def test_author_stats_runs_one_query(client, authors):
+    headers = authors[0]["headers"]
+    response_cache.bump("author_stats")
+    with assert_max_queries(1):
+        response = client.get("/api/v1/articles/author/stats", headers=headers, params={"limit": 10})
+    assert response.status_code == 200
+    counts = {row["author_id"]: row["article_count"] for row in response.json()}
+    assert all(counts[author["id"]] == 5 for author in authors)
+
+    with assert_max_queries(0):
+        assert client.get("/api/v1/articles/author/stats", headers=headers, params={"limit": 10}).status_code == 200
+
+
+def test_contact_list_runs_one_query(client, authors):
+    with assert_max_queries(1):
+        response = client.get("/api/v1/contacts/", headers=authors[1]["headers"])
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+
+
+def test_user_detail_runs_one_query(client, authors):
+    user_id = authors[2]["id"]
+    response_cache.bump(f"user:{user_id}")
+    with assert_max_queries(1):
+        response = client.get(f"/api/v1/users/{user_id}", headers=authors[0]["headers"])
+    assert response.status_code == 200
+
+
+def test_user_batch_runs_one_query(client, authors):
+    ids = [author["id"] for author in authors]
+    for user_id in ids:
+        response_cache.bump(f"user:{user_id}")
+    with assert_max_queries(1):
+        response = client.post("/api/v1/users/batch", headers=authors[0]["headers"], json={"ids": ids})
+    assert [user["id"] for user in response.json()] == ids
+
+
+def test_article_list_offset_page_runs_one_query(client, authors):
+    headers = authors[0]["headers"]
+    with assert_max_queries(1):
+        response = client.get("/api/v1/articles/", headers=headers, params={"limit": 5, "skip": 5})
+    assert response.status_code == 200
+    first = client.get("/api/v1/articles/", headers=headers, params={"limit": 10}).json()
+    assert [article["id"] for article in response.json()] == [article["id"] for article in first[5:]]
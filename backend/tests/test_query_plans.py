@@ -0,0 +1,89 @@
+"""查询计划检查：按查询模式建立的索引被实际使用（测试数据库为SQLite）
+
+SQLite对"ORDER BY id LIMIT"的主键顺序扫描和LIKE搜索报告为全表扫描，这些场景通过allow显式允许。
+"""
+import pytest
+import database
+from query_counter import QueryCounter, assert_queries_use_index
+from response_cache import response_cache
+
+pytestmark = pytest.mark.skipif(database.engine.dialect.name != "sqlite", reason="查询计划检查基于SQLite的EXPLAIN QUERY PLAN")
+
+
+def _plans(counter: QueryCounter) -> str:
+    details = []
+    with database.engine.connect() as conn:
+        for statement, parameters, executemany in counter.executions:
+            if statement.lstrip().upper().startswith("SELECT") and not executemany:
+                rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+                details.extend(row[-1] for row in rows)
+    return "\n".join(details)
+
+
+def test_article_list_by_author_uses_composite_index(client, authors):
+    with assert_queries_use_index() as counter:
+        response = client.get("/api/v1/articles/", headers=authors[0]["headers"],
+                              params={"author_id": authors[1]["id"], "limit": 2})
+    assert response.status_code == 200
+    assert "ix_articles_author_id_id" in _plans(counter)
+
+    # 按作者筛选的下一页同样走(author_id, id)索引
+    with assert_queries_use_index() as counter:
+        response = client.get("/api/v1/articles/", headers=authors[0]["headers"], params={
+            "author_id": authors[1]["id"], "limit": 2, "cursor": response.headers["X-Next-Cursor"],
+        })
+    assert len(response.json()) == 2
+    assert "ix_articles_author_id_id" in _plans(counter)
+
+
+def test_article_list_cursor_page_seeks_by_primary_key(client, authors):
+    headers = authors[0]["headers"]
+    first = client.get("/api/v1/articles/", headers=headers, params={"limit": 5})
+    with assert_queries_use_index():
+        response = client.get("/api/v1/articles/", headers=headers,
+                              params={"limit": 5, "cursor": first.headers["X-Next-Cursor"]})
+    assert response.status_code == 200
+
+
+def test_article_list_first_page_scans_in_primary_key_order(client, authors):
+    # 第一页按主键顺序带LIMIT扫描，SQLite报告为SCAN；作者信息按主键批量查询，不允许全表扫描
+    with assert_queries_use_index(allow=("articles",)):
+        response = client.get("/api/v1/articles/", headers=authors[0]["headers"],
+                              params={"limit": 5, "include_author": "true"})
+    assert response.status_code == 200
+
+
+def test_article_search_without_fulltext_index(client, authors):
+    # SQLite没有全文索引，搜索退化为LIKE，允许扫描articles
+    with assert_queries_use_index(allow=("articles",)):
+        response = client.get("/api/v1/articles/", headers=authors[0]["headers"], params={"search": "索引"})
+    assert response.status_code == 200
+    assert response.json()
+
+
+def test_article_detail_uses_primary_keys(client, authors):
+    headers = authors[0]["headers"]
+    article_id = client.get("/api/v1/articles/", headers=headers, params={"limit": 1}).json()[0]["id"]
+    response_cache.bump(f"article:{article_id}")
+    with assert_queries_use_index():
+        assert client.get(f"/api/v1/articles/{article_id}", headers=headers).status_code == 200
+
+
+def test_author_stats_uses_article_count_index(client, authors):
+    response_cache.bump("author_stats")
+    with assert_queries_use_index() as counter:
+        response = client.get("/api/v1/articles/author/stats", headers=authors[0]["headers"], params={"limit": 10})
+    assert response.status_code == 200
+    assert "ix_users_article_count_id" in _plans(counter)
+
+
+def test_contact_list_and_search_use_user_indexes(client, authors):
+    headers = authors[1]["headers"]
+    with assert_queries_use_index() as counter:
+        assert client.get("/api/v1/contacts/", headers=headers).status_code == 200
+    assert "ix_contacts_user_id_id" in _plans(counter)
+
+    with assert_queries_use_index() as counter:
+        response = client.get("/api/v1/contacts/", headers=headers, params={"search": "联系人"})
+    assert len(response.json()) == 5
+    assert "ix_contacts_user_id" in _plans(counter)
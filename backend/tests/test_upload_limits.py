@@ -0,0 +1,30 @@
+"""头像上传的请求体大小限制"""
+from routers import users
+
+OVERSIZED = b"\x00" * (users.AVATAR_MAX_BODY_BYTES + 1)
+
+
+def test_avatar_rejected_by_content_length(client, authors):
+    response = client.post("/api/v1/users/avatar", headers=authors[0]["headers"],
+                           files={"file": ("avatar.png", OVERSIZED, "image/png")})
+    assert response.status_code == 413
+
+
+def test_avatar_rejected_while_streaming_without_content_length(client, authors):
+    def chunks():
+        yield b'--x\r\nContent-Disposition: form-data; name="file"; filename="avatar.png"\r\nContent-Type: image/png\r\n\r\n'
+        for start in range(0, len(OVERSIZED), 64 * 1024):
+            yield OVERSIZED[start:start + 64 * 1024]
+
+    response = client.post("/api/v1/users/avatar", content=chunks(), headers={
+        **authors[0]["headers"], "Content-Type": "multipart/form-data; boundary=x",
+    })
+    assert response.status_code == 413
+
+
+def test_avatar_within_limit_reaches_handler(client, authors):
+    response = client.post("/api/v1/users/avatar", headers=authors[0]["headers"],
+                           files={"file": ("avatar.txt", b"text", "text/plain")})
+    # 未超过上限的请求由接口自己校验
+    assert response.status_code == 400
+    assert response.json()["detail"] == "只能上传图片文件"
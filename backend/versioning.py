@@ -0,0 +1,47 @@
+from typing import List, Optional
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import update
+
+# 资源的ETag格式为"<版本号>"或"<版本号>-<摘要>"（带缓存的详情接口），If-Match只比较版本号部分
+
+
+def format_etag(version: int, digest: Optional[str] = None) -> str:
+    return f'"{version}-{digest}"' if digest else f'"{version}"'
+
+
+def set_etag(response: Response, version: int):
+    response.headers["ETag"] = format_etag(version)
+
+
+def if_match_versions(request: Request) -> Optional[List[int]]:
+    """解析If-Match请求头，未提供或为*时返回None（不检查版本）"""
+    header = request.headers.get("if-match")
+    if not header:
+        return None
+    versions = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return None
+        # 弱ETag不能用于If-Match，按不匹配处理
+        if tag.startswith("W/"):
+            continue
+        version = tag.strip('"').split("-", 1)[0]
+        if version.isdigit():
+            versions.append(int(version))
+    return versions
+
+
+def versioned_update(model, filters, values: dict, expected_versions: Optional[List[int]]):
+    """生成单条UPDATE语句：按条件和期望版本号更新并递增版本号"""
+    stmt = update(model).where(*filters)
+    if expected_versions is not None:
+        stmt = stmt.where(model.version.in_(expected_versions))
+    return stmt.values(**values, version=model.version + 1).execution_options(synchronize_session=False)
+
+
+def precondition_failed():
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="资源已被修改，请重新获取后再提交",
+    )
@@ -11,6 +11,9 @@ const { Title, Text } = Typography;
 const { TextArea } = Input;
 const { TabPane } = Tabs;
 
+// 作者统计每次加载的作者数（接口按文章数倒序分页返回）
+const AUTHOR_STATS_PAGE_SIZE = 50;
+
 const ArticlesPage = () => {
   const [articles, setArticles] = useState([]);
   const [loading, setLoading] = useState(false);
@@ -27,6 +30,7 @@ const ArticlesPage = () => {
   });
   const [authorStats, setAuthorStats] = useState([]);
   const [statsLoading, setStatsLoading] = useState(true);
+  const [statsHasMore, setStatsHasMore] = useState(false);
   
   // 加载文章数据
   const fetchArticles = async (page = 1, pageSize = 10, search = '') => {
@@ -56,12 +60,14 @@ const ArticlesPage = () => {
     }
   };
 
-  // 加载作者统计数据
-  const fetchAuthorStats = async () => {
+  // 加载作者统计数据（分页加载，append为true时追加下一页）
+  const fetchAuthorStats = async (append = false) => {
     setStatsLoading(true);
     try {
-      const response = await articleAPI.getAuthorStats();
-      setAuthorStats(response.data);
+      const skip = append ? authorStats.length : 0;
+      const response = await articleAPI.getAuthorStats({ skip, limit: AUTHOR_STATS_PAGE_SIZE });
+      setAuthorStats(append ? [...authorStats, ...response.data] : response.data);
+      setStatsHasMore(response.data.length === AUTHOR_STATS_PAGE_SIZE);
     } catch (error) {
       console.error('获取作者统计数据失败:', error);
       message.error('获取统计数据失败');
@@ -210,7 +216,7 @@ const ArticlesPage = () => {
     
     return {
       title: {
-        text: '作者文章数量统计',
+        text: statsHasMore ? `文章数最多的${authorStats.length}位作者` : '作者文章数量统计',
         left: 'center'
       },
       tooltip: {
@@ -316,6 +322,13 @@ const ArticlesPage = () => {
                     <List
                       itemLayout="horizontal"
                       dataSource={authorStats}
+                      loadMore={statsHasMore && (
+                        <div style={{ textAlign: 'center', marginTop: 12 }}>
+                          <Button onClick={() => fetchAuthorStats(true)} loading={statsLoading}>
+                            加载更多
+                          </Button>
+                        </div>
+                      )}
                       renderItem={author => (
                         <List.Item 
                           actions={[
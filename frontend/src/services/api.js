@@ -89,6 +89,14 @@ export const userAPI = {
   getAuthorDetail: (authorId) => {
     return api.get(`/users/${authorId}`);
   },
+
+  // 批量获取用户信息（一次请求代替逐个获取，ID较多时使用请求体）
+  getUsersByIds: (ids) => {
+    if (ids.length > 50) {
+      return api.post('/users/batch', { ids });
+    }
+    return api.get('/users', { params: { ids: ids.join(',') } });
+  },
 };
 
 // 联系人相关 API
@@ -117,6 +125,26 @@ export const contactAPI = {
   deleteContact: (id) => {
     return api.delete(`/contacts/${id}`);
   },
+
+  // 批量创建联系人
+  bulkCreateContacts: (contacts) => {
+    return api.post('/contacts/bulk', contacts);
+  },
+
+  // 批量更新联系人
+  bulkUpdateContacts: (contacts) => {
+    return api.put('/contacts/bulk', contacts);
+  },
+
+  // 批量删除联系人
+  bulkDeleteContacts: (ids) => {
+    return api.delete('/contacts/bulk', { data: { ids } });
+  },
+
+  // 导出联系人（format: ndjson 或 csv）
+  exportContacts: (format = 'csv') => {
+    return api.get('/contacts/export', { params: { format }, responseType: 'blob' });
+  },
 };
 
 // 文章相关 API
@@ -146,9 +174,14 @@ export const articleAPI = {
     return api.delete(`/articles/${id}`);
   },
 
+  // 导出文章（format: ndjson 或 csv）
+  exportArticles: (params = {}) => {
+    return api.get('/articles/export', { params, responseType: 'blob' });
+  },
+
   // 获取作者统计数据
-  getAuthorStats: () => {
-    return api.get('/articles/author/stats');
+  getAuthorStats: (params = {}) => {
+    return api.get('/articles/author/stats', { params });
   },
   
   // 获取特定作者的文章